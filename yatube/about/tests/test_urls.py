@@ -1,5 +1,6 @@
 # about/tests/tests_url.py
 from http import HTTPStatus
+from django.core.cache import cache
 from django.test import TestCase
 
 url_templates_list = {
@@ -10,6 +11,9 @@ url_templates_list = {
 
 class StaticURLTests(TestCase):
 
+    def setUp(self):
+        cache.clear()
+
     def test_about_page(self):
         """Проверка доступности адреса /about/."""
         for value in url_templates_list:
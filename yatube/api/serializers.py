@@ -0,0 +1,75 @@
+"""Представление моделей posts в JSON с выбором полей (?fields=).
+
+Каждый ресурс описан словарём «имя поля -> функция от объекта».
+Функции читают только поля самого объекта и связей из select_related,
+поэтому выбор полей не добавляет запросов.
+"""
+from posts import counters
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _stat(name):
+    return lambda user: getattr(counters.get_stats(user), name)
+
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: _isoformat(post.pub_date),
+    'updated': lambda post: _isoformat(post.updated),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: _isoformat(comment.created),
+}
+
+GROUP_FIELDS = {
+    'id': lambda group: group.pk,
+    'slug': lambda group: group.slug,
+    'title': lambda group: group.title,
+    'description': lambda group: group.description,
+}
+
+PROFILE_FIELDS = {
+    'id': lambda user: user.pk,
+    'username': lambda user: user.username,
+    'first_name': lambda user: user.first_name,
+    'last_name': lambda user: user.last_name,
+    'posts_count': _stat('posts_count'),
+    'followers_count': _stat('followers_count'),
+    'following_count': _stat('following_count'),
+}
+
+
+class FieldsError(ValueError):
+    """В ?fields= указаны поля, которых у ресурса нет."""
+
+
+def parse_fields(value, available):
+    """Список полей из параметра ?fields=; по умолчанию — все поля."""
+    if not value:
+        return list(available)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise FieldsError(
+            'Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown) or '-', ', '.join(available)
+            )
+        )
+    return names
+
+
+def serialize(obj, fields, available):
+    return {name: available[name](obj) for name in fields}
@@ -0,0 +1,126 @@
+# api/tests/test_views.py
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    """JSON API только для чтения."""
+
+    POSTS_COUNT = 15
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(cls.POSTS_COUNT):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text='Тестовый пост № %s' % num,
+            )
+        for num in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='Комментарий %s' % num
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_json(self, url, params=None, client=None, status=200):
+        response = (client or self.client).get(url, params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_post_list_pages(self):
+        """Посты листаются курсором по ссылке next."""
+        url = reverse('api:post_list')
+        first = self.get_json(url)
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        second = self.get_json(first['next'])
+        self.assertEqual(len(second['results']), self.POSTS_COUNT - 10)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(
+            ids, list(Post.objects.values_list('id', flat=True))
+        )
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет в ответе только запрошенные поля."""
+        data = self.get_json(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            {'fields': 'id,author'},
+        )
+        self.assertEqual(data, {'id': self.post.pk, 'author': 'author'})
+        data = self.get_json(
+            reverse('api:post_list'), {'fields': 'id,secret'}, status=400
+        )
+        self.assertIn('secret', data['detail'])
+
+    def test_fixed_query_count(self):
+        """Число запросов не зависит от размера страницы."""
+        urls = (
+            (reverse('api:post_list'), 1),
+            (reverse('api:group_posts', kwargs={'slug': 'test_slug'}), 2),
+            (reverse('api:profile_posts', kwargs={'username': 'author'}), 2),
+            (reverse('api:comment_list', kwargs={'post_id': self.post.pk}), 2),
+        )
+        for url, queries in urls:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    small = self.get_json(url, {'limit': 1})
+                with self.assertNumQueries(queries):
+                    big = self.get_json(url, {'limit': 100})
+                self.assertEqual(len(small['results']), 1)
+                self.assertGreater(len(big['results']), 1)
+
+    def test_resources(self):
+        """Группы, профили и комментарии."""
+        groups = self.get_json(reverse('api:group_list'))
+        self.assertEqual(groups['results'][0]['slug'], 'test_slug')
+        profile = self.get_json(
+            reverse('api:profile_detail', kwargs={'username': 'author'})
+        )
+        self.assertEqual(profile['posts_count'], self.POSTS_COUNT)
+        self.assertEqual(profile['followers_count'], 1)
+        comments = self.get_json(
+            reverse('api:comment_list', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(
+            [comment['text'] for comment in comments['results']],
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'],
+        )
+
+    def test_not_found(self):
+        """Несуществующие объекты отдают 404 в JSON."""
+        urls = (
+            reverse('api:post_detail', kwargs={'post_id': 10 ** 6}),
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile_detail', kwargs={'username': 'missing'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn('detail', self.get_json(url, status=404))
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только после входа."""
+        url = reverse('api:follow_feed')
+        self.get_json(url, status=401)
+        data = self.get_json(url, client=self.authorized_client)
+        self.assertEqual(len(data['results']), 10)
+        self.assertTrue(data['next'])
+
+    def test_read_only(self):
+        """Запись через API не поддерживается."""
+        response = self.authorized_client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,158 @@
+# api/views.py
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.query_budget import query_budget
+from posts import timeline
+from posts.models import Group, Post
+from posts.utils import COMMENTS_ORDERING, POSTS_ORDERING, CursorPaginator
+
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, PROFILE_FIELDS, FieldsError,
+    parse_fields, serialize,
+)
+
+DEFAULT_LIMIT: int = 10
+MAX_LIMIT: int = 100
+GROUPS_ORDERING = ('slug', 'id')
+
+User = get_user_model()
+
+
+def error(message, status=400):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('limit должен быть числом.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit должен быть от 1 до {MAX_LIMIT}.')
+    return limit
+
+
+def page_url(request, cursor):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(
+        '{}?{}'.format(request.path, params.urlencode())
+    )
+
+
+def paginated(request, queryset, available, ordering=POSTS_ORDERING,
+              sources=None):
+    """Страница ресурсов по курсору: один запрос на источник."""
+    try:
+        fields = parse_fields(request.GET.get('fields'), available)
+        limit = get_limit(request)
+    except ValueError as exc:
+        return error(str(exc))
+    paginator = CursorPaginator(queryset, limit, ordering, sources)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize(obj, fields, available) for obj in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+def detail(request, obj, available, name):
+    if obj is None:
+        return error(f'{name} не найден.', status=404)
+    try:
+        fields = parse_fields(request.GET.get('fields'), available)
+    except FieldsError as exc:
+        return error(str(exc))
+    return JsonResponse(serialize(obj, fields, available))
+
+
+def posts_queryset():
+    return Post.objects.select_related('author', 'group')
+
+
+@query_budget(3)
+@require_GET
+def post_list(request):
+    """Все посты, новые сначала."""
+    return paginated(request, posts_queryset(), POST_FIELDS)
+
+
+@query_budget(3)
+@require_GET
+def post_detail(request, post_id):
+    post = posts_queryset().filter(pk=post_id).first()
+    return detail(request, post, POST_FIELDS, 'Пост')
+
+
+@query_budget(4)
+@require_GET
+def comment_list(request, post_id):
+    """Комментарии поста в порядке написания."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден.', status=404)
+    comments = Post(pk=post_id).comments.select_related('author')
+    return paginated(request, comments, COMMENT_FIELDS, COMMENTS_ORDERING)
+
+
+@query_budget(3)
+@require_GET
+def group_list(request):
+    return paginated(
+        request, Group.objects.all(), GROUP_FIELDS, GROUPS_ORDERING
+    )
+
+
+@query_budget(3)
+@require_GET
+def group_detail(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    return detail(request, group, GROUP_FIELDS, 'Группа')
+
+
+@query_budget(4)
+@require_GET
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error('Группа не найдена.', status=404)
+    return paginated(
+        request, posts_queryset().filter(group=group), POST_FIELDS
+    )
+
+
+@query_budget(3)
+@require_GET
+def profile_detail(request, username):
+    author = User.objects.select_related('stats').filter(
+        username=username
+    ).first()
+    return detail(request, author, PROFILE_FIELDS, 'Пользователь')
+
+
+@query_budget(4)
+@require_GET
+def profile_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error('Пользователь не найден.', status=404)
+    return paginated(
+        request, posts_queryset().filter(author=author), POST_FIELDS
+    )
+
+
+@query_budget(6)
+@require_GET
+def follow_feed(request):
+    """Лента подписок текущего пользователя (сессия сайта)."""
+    if not request.user.is_authenticated:
+        return error('Нужно войти на сайт.', status=401)
+    posts = Post.objects.filter(author__following__user=request.user)
+    return paginated(
+        request, posts, POST_FIELDS,
+        sources=timeline.get_sources(request.user)
+    )
@@ -0,0 +1,300 @@
+"""Кэш Django в файле SQLite (WAL), общий для всех процессов хоста.
+
+LocMemCache у каждого воркера свой: попадания делятся на число
+воркеров, а сброс поколений в одном воркере не виден остальным. Этот
+бэкенд не требует сервера: все процессы открывают один файл, WAL
+позволяет читать параллельно с записью.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube_cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+Вытеснение — LRU: время последнего чтения обновляется не чаще раза в
+TOUCH_INTERVAL секунд, чтобы чтения почти не превращались в записи.
+Размер проверяется каждые CULL_EVERY записей процесса, поэтому между
+проверками кэш может превысить MAX_ENTRIES на эту величину.
+Целые числа хранятся как INTEGER, остальное — pickle.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Ограничение SQLite на число параметров в старых сборках — 999.
+CHUNK_SIZE = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._timeout_seconds = float(options.get('BUSY_TIMEOUT', 5))
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 1))
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._local = threading.local()
+
+    # Соединения
+
+    @property
+    def _db(self):
+        """Соединение текущего потока; после fork открывается заново."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path,
+                timeout=self._timeout_seconds,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for sql in SCHEMA:
+                db.execute(sql)
+            local.db, local.pid, local.writes = db, os.getpid(), 0
+        return local.db
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE: блокировка записи берётся сразу, а не при
+        первом UPDATE, поэтому чтение-изменение-запись атомарно."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    # Кодирование значений
+
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, self.pickle_protocol))
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # Чтение
+
+    def _select(self, keys):
+        """{ключ: значение} неистёкших записей; продлевает их в LRU."""
+        now = time.time()
+        found, stale = {}, []
+        for chunk in _chunks(keys):
+            rows = self._db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                'WHERE key IN ({})'.format(', '.join('?' * len(chunk))),
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = value
+                if now - accessed >= self._touch_interval:
+                    stale.append(key)
+        for chunk in _chunks(stale):
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key IN ({})'.format(
+                    ', '.join('?' * len(chunk))
+                ),
+                [now, *chunk],
+            )
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        found = self._select([key])
+        if key not in found:
+            return default
+        return self._decode(found[key])
+
+    def get_many(self, keys, version=None):
+        keys_map = {}
+        for key in keys:
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            keys_map[made] = key
+        found = self._select(list(keys_map))
+        return {
+            keys_map[key]: self._decode(value) for key, value in found.items()
+        }
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    # Запись
+
+    def _write(self, rows):
+        with self._transaction() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+        self._maybe_cull(len(rows))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(
+            [(key, self._encode(value), self._expiry(timeout), time.time())]
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self._expiry(timeout), time.time()
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._encode(value), expires, now))
+        if rows:
+            self._write(rows)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now)
+            )
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), self._expiry(timeout), now),
+            ).rowcount == 1
+        if added:
+            self._maybe_cull(1)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(value), now, key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as db:
+            return db.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self._expiry(timeout), now, key, now),
+            ).rowcount == 1
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            made.append(key)
+        with self._transaction() as db:
+            for chunk in _chunks(made):
+                db.execute(
+                    'DELETE FROM cache WHERE key IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    chunk,
+                )
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+
+    # Вытеснение
+
+    def _maybe_cull(self, writes):
+        local = self._local
+        local.writes += writes
+        if local.writes >= self._cull_every:
+            local.writes = 0
+            self._cull()
+
+    def _cull(self):
+        """Удаляет истёкшие записи, затем самые давно читанные."""
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
+            count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            excess = count - self._max_entries
+            # Как и остальные бэкенды Django, удаляем с запасом:
+            # 1/CULL_FREQUENCY записей, но не меньше превышения.
+            if self._cull_frequency:
+                excess = max(excess, count // self._cull_frequency)
+            else:
+                excess = count
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (excess,),
+            )
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами: открытие файла и
+        # проверка схемы дороже самих операций с кэшем.
+        pass
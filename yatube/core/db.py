@@ -0,0 +1,80 @@
+"""Настройка соединений SQLite и повтор записи при блокировке базы.
+
+В режиме журнала по умолчанию (rollback journal) писатель блокирует
+и читателей, и конкурентные запросы воркеров получают
+«database is locked». WAL разрешает читать во время записи, а
+busy_timeout заставляет ждать блокировку, а не падать сразу.
+
+Но и в WAL транзакция, которая начала с чтения, не может стать
+пишущей, если другой процесс успел записать: SQLite отвечает
+SQLITE_BUSY сразу, не дожидаясь busy_timeout. Поэтому atomic()
+начинается с BEGIN IMMEDIATE (core.db_backends.sqlite3), а оставшиеся
+ошибки — например, исчерпанный busy_timeout — retry_on_locked
+откатывает и повторяет.
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created: PRAGMA из SQLITE_PRAGMAS для SQLite.
+
+    Выполняются на сыром соединении sqlite3, мимо курсора Django: иначе
+    execute_wrapper'ы (бюджет запросов, метрики, журнал медленных
+    запросов) считали бы их в каждом запросе при CONN_MAX_AGE = 0.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(error):
+    message = str(error).lower()
+    return any(text in message for text in LOCKED_MESSAGES)
+
+
+def retry_on_locked(attempts=None, delay=0.05, methods=WRITE_METHODS):
+    """Повторяет представление в новой транзакции, если база занята.
+
+    Представление выполняется в transaction.atomic(), поэтому неудачная
+    попытка откатывается целиком. Паузы между попытками растут
+    экспоненциально со случайным разбросом, чтобы воркеры не
+    повторяли запись одновременно.
+
+    Только для запросов с методами methods: atomic() начинается с
+    BEGIN IMMEDIATE и держит блокировку записи всей базы, а GET формы
+    ничего не пишет. Представления, которые пишут по GET (подписка),
+    передают свои методы.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view_func(request, *args, **kwargs)
+            total = attempts or getattr(settings, 'WRITE_RETRY_ATTEMPTS', 3)
+            for attempt in range(1, total + 1):
+                try:
+                    with transaction.atomic():
+                        return view_func(request, *args, **kwargs)
+                except OperationalError as error:
+                    if attempt == total or not is_locked_error(error):
+                        raise
+                    logger.info(
+                        'Retrying %s after "%s" (attempt %s of %s)',
+                        view_func.__name__, error, attempt, total,
+                    )
+                    time.sleep(delay * 2 ** (attempt - 1) * random.random())
+        return wrapper
+    return decorator
@@ -0,0 +1,22 @@
+"""django.db.backends.sqlite3 с выбором режима BEGIN в atomic().
+
+Обычный BEGIN (DEFERRED) берёт блокировку записи только на первом
+INSERT/UPDATE. Если к этому моменту другой процесс уже записал, SQLite
+в режиме WAL сразу отвечает «database is locked»: busy_timeout тут не
+помогает, потому что прочитанный снимок данных устарел. С
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE' блокировка берётся в начале
+транзакции, и конкурирующие писатели ждут друг друга в пределах
+busy_timeout.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        mode = getattr(settings, 'SQLITE_TRANSACTION_MODE', 'DEFERRED')
+        if mode not in TRANSACTION_MODES:
+            raise ValueError(f'Неизвестный режим транзакции SQLite: {mode}')
+        self.cursor().execute(f'BEGIN {mode}')
@@ -0,0 +1,104 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики читаются только внутри представлений из REPLICA_READ_VIEWS
+(их включает ReplicaMiddleware) и только для безопасных запросов
+(GET, HEAD). Всё остальное — POST, админка, команды, фоновые потоки —
+работает с основной базой.
+
+Read-your-writes: если за запрос что-то записано в базу, браузер
+получает куку, и следующие REPLICA_PIN_SECONDS секунд его запросы
+тоже читают основную базу — реплика к тому времени догоняет.
+
+То же для кэша под поколениями (posts.cache): пока реплика может не
+знать о последнем сдвиге поколения, запрос, прочитавший это поколение,
+дальше читает основную базу (read_from_primary()) — иначе отстающая
+реплика сохранила бы под новым поколением прежние данные.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def _is_reading_replicas():
+    return (
+        getattr(_state, 'replicas', False)
+        and not getattr(_state, 'primary', False)
+        and not getattr(_state, 'pinned', 0)
+        # Запрос уже писал: дальше читаем свои же записи.
+        and not getattr(_state, 'wrote', False)
+    )
+
+
+@contextmanager
+def request_scope():
+    """Состояние маршрутизации на время одного HTTP-запроса.
+
+    По умолчанию запрос читает основную базу; представление разрешает
+    реплики вызовом read_from_replicas(). read_from_primary() внешнего
+    блока действует и во вложенном.
+    """
+    previous = dict(vars(_state))
+    _state.replicas = _state.wrote = False
+    _state.primary = previous.get('primary', False)
+    try:
+        yield
+    finally:
+        vars(_state).clear()
+        vars(_state).update(previous)
+
+
+def read_from_replicas():
+    _state.replicas = True
+
+
+def read_from_primary():
+    """До конца request_scope() читать основную базу."""
+    _state.primary = True
+
+
+@contextmanager
+def pin_primary():
+    """Внутри блока и чтение, и запись идут в основную базу."""
+    _state.pinned = getattr(_state, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _state.pinned -= 1
+
+
+def wrote():
+    """Была ли запись в базу с начала текущего request_scope()."""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and _is_reading_replicas():
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы: связи между ними допустимы.
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
@@ -0,0 +1,110 @@
+import json
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.sqlite.SQLiteCache',
+}
+MANY = 50
+LOCATIONS = {
+    'locmem': 'cache-benchmark',
+    'filebased': '{dir}/files',
+    'sqlite': '{dir}/cache.sqlite3',
+}
+
+
+def bench_set(cache, operations, keys, value):
+    for num in range(operations):
+        cache.set(keys[num % len(keys)], value)
+
+
+def bench_get(cache, operations, keys, value):
+    for num in range(operations):
+        cache.get(keys[num % len(keys)])
+
+
+def bench_get_many(cache, operations, keys, value):
+    for _ in range(operations // MANY):
+        cache.get_many(keys[:MANY])
+
+
+def bench_set_many(cache, operations, keys, value):
+    data = dict.fromkeys(keys[:MANY], value)
+    for _ in range(operations // MANY):
+        cache.set_many(data)
+
+
+def bench_incr(cache, operations, keys, value):
+    cache.set('counter', 0)
+    for _ in range(operations):
+        cache.incr('counter')
+
+
+# Сценарий выполняет operations операций (ключей для *_many).
+SCENARIOS = {
+    'set': bench_set,
+    'get': bench_get,
+    'get_many': bench_get_many,
+    'set_many': bench_set_many,
+    'incr': bench_incr,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость кэш-бэкендов LocMemCache, FileBasedCache и '
+        'SQLiteCache на типичных операциях (операций в секунду).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument(
+            '--value-size', type=int, default=2000,
+            help='Размер значения в байтах (карточка поста — около 2 КБ).',
+        )
+        parser.add_argument(
+            '--backends', nargs='+', choices=list(BACKENDS),
+            default=list(BACKENDS),
+        )
+        parser.add_argument('--output', '-o', help='Сохранить итог в JSON.')
+
+    def handle(self, *args, **options):
+        keys = [f'benchmark:{num}' for num in range(options['keys'])]
+        value = 'x' * options['value_size']
+        directory = tempfile.mkdtemp()
+        results = {}
+        try:
+            for name in options['backends']:
+                cache = import_string(BACKENDS[name])(
+                    LOCATIONS[name].format(dir=directory),
+                    {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2}},
+                )
+                results[name] = {}
+                for operation, scenario in SCENARIOS.items():
+                    start = time.perf_counter()
+                    scenario(cache, options['operations'], keys, value)
+                    elapsed = time.perf_counter() - start
+                    results[name][operation] = round(
+                        options['operations'] / elapsed
+                    )
+                cache.clear()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        operations = list(next(iter(results.values())))
+        self.stdout.write(
+            f'{"операций/с":<12}' + ''.join(f'{op:>12}' for op in operations)
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<12}' + ''.join(f'{row[op]:>12}' for op in operations)
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, indent=2)
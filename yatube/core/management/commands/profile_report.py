@@ -0,0 +1,68 @@
+import statistics
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка замеров ProfilerMiddleware: по каждому представлению — '
+        'число замеров, время ответа, SQL и шаблонов и самые дорогие '
+        'функции по всем его замерам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Каталог замеров (PROFILER_DIR).')
+        parser.add_argument('--view', help='Только это представление.')
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument(
+            '--sort', choices=('tottime', 'cumtime'), default='tottime',
+            help='tottime — время в самой функции, cumtime — с вызовами.',
+        )
+        parser.add_argument(
+            '--token', action='store_true',
+            help='Напечатать значение заголовка PROFILER_HEADER и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.make_token())
+            return
+        samples = profiling.load_samples(options['dir'], options['view'])
+        if not samples:
+            self.stdout.write('Замеров нет.')
+            return
+        by_view = defaultdict(list)
+        for meta, path in samples:
+            by_view[meta.get('view') or 'unknown'].append((meta, path))
+        for view, rows in sorted(by_view.items()):
+            self.report(view, rows, options)
+
+    def report(self, view, rows, options):
+        durations = [meta['duration_ms'] for meta, _ in rows]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{view}: {len(rows)} замеров, ответ медиана '
+            f'{statistics.median(durations):.1f} ms, максимум '
+            f'{max(durations):.1f} ms'
+        ))
+        self.stdout.write(
+            '  в среднем: SQL {:.1f} ms ({:.1f} запросов), шаблоны '
+            '{:.1f} ms'.format(
+                statistics.mean(meta['sql_ms'] for meta, _ in rows),
+                statistics.mean(meta['sql_count'] for meta, _ in rows),
+                statistics.mean(meta['template_ms'] for meta, _ in rows),
+            )
+        )
+        self.stdout.write(
+            f'  {"вызовов":>9} {"tottime":>9} {"cumtime":>9}  функция'
+        )
+        functions = profiling.hot_functions(
+            [path for _, path in rows], options['sort'], options['limit']
+        )
+        for label, calls, tottime, cumtime in functions:
+            self.stdout.write(
+                f'  {calls:>9} {tottime * 1000:>7.1f}ms '
+                f'{cumtime * 1000:>7.1f}ms  {label}'
+            )
@@ -0,0 +1,60 @@
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core import slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов (SLOW_QUERY_LOG): отпечатки '
+        'с наибольшим суммарным временем, представления, из которых они '
+        'выполнялись, и место в коде.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Журнал (SLOW_QUERY_LOG).')
+        parser.add_argument('--view', help='Только это представление.')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--sort', choices=('total', 'max', 'count'), default='total'
+        )
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        for record in slow_queries.read_log(options['file']):
+            if options['view'] and record.get('view') != options['view']:
+                continue
+            groups[record['fingerprint']].append(record)
+        if not groups:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        key = {
+            'total': lambda rows: sum(row['duration_ms'] for row in rows),
+            'max': lambda rows: max(row['duration_ms'] for row in rows),
+            'count': len,
+        }[options['sort']]
+        worst = sorted(groups.items(), key=lambda item: key(item[1]),
+                       reverse=True)
+        for sql, rows in worst[:options['limit']]:
+            self.report(sql, rows)
+
+    def report(self, sql, rows):
+        durations = [row['duration_ms'] for row in rows]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{len(rows)} раз, всего {sum(durations):.1f} ms, в среднем '
+            f'{sum(durations) / len(rows):.1f} ms, максимум '
+            f'{max(durations):.1f} ms'
+        ))
+        self.stdout.write(f'  {sql[:500]}')
+        views = Counter(row.get('view') or '-' for row in rows)
+        self.stdout.write('  представления: ' + ', '.join(
+            f'{view} ({count})' for view, count in views.most_common(3)
+        ))
+        # Три ближайших к запросу кадра: место вызова и кто его вызвал.
+        places = Counter(
+            ' < '.join(reversed(row['stack'][-3:]))
+            for row in rows if row['stack']
+        )
+        for place, count in places.most_common(3):
+            self.stdout.write(f'  {count:>5} × {place}')
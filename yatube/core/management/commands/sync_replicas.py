@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик (DATABASE_REPLICAS). '
+        'Для локальной проверки маршрутизации чтения на реплики.'
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_REPLICAS=N.'
+            )
+        for alias in [DEFAULT_DB_ALIAS, *replicas]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: поддерживается только SQLite.')
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                with target:
+                    source.backup(target)
+                target.close()
+                self.stdout.write(f'{alias}: скопировано')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены.'))
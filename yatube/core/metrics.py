@@ -0,0 +1,410 @@
+"""Метрики в памяти процесса и их выдача в формате Prometheus.
+
+Счётчики (Counter), текущие значения (Gauge) и гистограммы с
+фиксированными границами (Histogram) меняются под коротким замком
+метрики, без обращений к диску. Каждый процесс время от времени
+(maybe_flush, не чаще METRICS_FLUSH_INTERVAL секунд) сбрасывает свои
+значения в файл METRICS_DIR/<pid>.json, а /metrics складывает файлы
+всех процессов: счётчики и гистограммы суммируются, gauges берутся
+только от живых процессов.
+
+Файлы завершившихся процессов переносятся (fold) в общий folded.json
+и удаляются, поэтому каталог не растёт с перезапусками воркеров, а
+счётчики не убывают. Файл со своим pid, оставшийся от мёртвого
+процесса с тем же pid, процесс переносит перед первой записью.
+
+Метрики объявляются на уровне модулей:
+
+    THUMBNAILS = metrics.histogram(
+        'posts_thumbnail_seconds', 'Время генерации миниатюры.'
+    )
+    THUMBNAILS.observe(0.42)
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+FOLDED = 'folded.json'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labels}, '
+                f'получены {tuple(labels)}'
+            )
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), self._copy(value)]
+                    for key, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def merge(self, total, value, alive):
+        """Добавляет значение одного процесса к сумме total."""
+        return (total or 0) + value
+
+    def samples(self, key, value):
+        """Строки (суффикс имени, метки, значение) для выдачи."""
+        yield '', dict(zip(self.labels, key)), value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Текущее значение; mode — как сводить процессы: sum или max."""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), mode='sum'):
+        super().__init__(name, documentation, labels)
+        if mode not in ('sum', 'max'):
+            raise ValueError(f'{name}: неизвестный режим {mode}')
+        self.mode = mode
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, total, value, alive):
+        if not alive:
+            return total
+        if total is None:
+            return value
+        return total + value if self.mode == 'sum' else max(total, value)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1]]
+
+    def merge(self, total, value, alive):
+        counts, summed = value
+        if total is None:
+            return [list(counts), summed]
+        return [
+            [a + b for a, b in zip(total[0], counts)], total[1] + summed
+        ]
+
+    def samples(self, key, value):
+        labels = dict(zip(self.labels, key))
+        counts, summed = value
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += count
+            yield '_bucket', {**labels, 'le': _number(bound)}, cumulative
+        yield '_sum', labels, summed
+        yield '_count', labels, cumulative
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return f'{value:.1f}'
+    return repr(value)
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    )
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _locked(directory):
+    """Блокировка каталога метрик на время переноса и чтения файлов."""
+    with open(os.path.join(directory, '.lock'), 'w') as stream:
+        fcntl.flock(stream, fcntl.LOCK_EX)
+        yield
+
+
+def _write(directory, filename, data):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as stream:
+        json.dump(data, stream)
+    os.replace(tmp, os.path.join(directory, filename))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._own_file = False
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f'Метрика {metric.name} уже объявлена.')
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=(), mode='sum'):
+        return self.register(Gauge(name, documentation, labels, mode))
+
+    def histogram(self, name, documentation, labels=(),
+                  buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+        self._own_file = False
+
+    # Файлы процессов
+
+    @staticmethod
+    def get_directory():
+        return getattr(
+            settings, 'METRICS_DIR',
+            os.path.join(tempfile.gettempdir(), 'yatube_metrics'),
+        )
+
+    def flush(self, directory=None):
+        """Записывает значения процесса в <pid>.json атомарно."""
+        directory = directory or self.get_directory()
+        os.makedirs(directory, exist_ok=True)
+        pid = os.getpid()
+        if not self._own_file:
+            # Файл с нашим pid до первой записи принадлежит мёртвому
+            # процессу: затереть его — потерять его счётчики.
+            self.fold(directory, pids=[pid])
+            self._own_file = True
+        data = {
+            name: metric.snapshot()
+            for name, metric in list(self._metrics.items())
+        }
+        _write(directory, f'{pid}.json', data)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    @staticmethod
+    def _read(directory):
+        """Пары (pid или None для folded.json, значения) из файлов."""
+        try:
+            files = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for filename in files:
+            name, ext = os.path.splitext(filename)
+            if ext != '.json' or not (name.isdigit() or filename == FOLDED):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as stream:
+                    data = json.load(stream)
+            except (OSError, ValueError):
+                continue
+            yield (int(name) if name.isdigit() else None), data
+
+    def _merge(self, totals, data, alive):
+        for name, rows in data.items():
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            values = totals.setdefault(name, {})
+            for key, value in rows:
+                key = tuple(key)
+                merged = metric.merge(values.get(key), value, alive)
+                if merged is not None:
+                    values[key] = merged
+        return totals
+
+    def _fold(self, directory, pids=None):
+        totals, unknown, folded = {}, {}, []
+        for pid, data in self._read(directory):
+            if pid is None:
+                # Метрики, которых нет в этом процессе, переносятся как есть.
+                unknown = {
+                    name: rows for name, rows in data.items()
+                    if name not in self._metrics
+                }
+            elif (pid in pids) if pids is not None else not _is_alive(pid):
+                folded.append(pid)
+            else:
+                continue
+            self._merge(totals, data, alive=False)
+        if not folded:
+            return
+        _write(directory, FOLDED, {**unknown, **{
+            name: [[list(key), value] for key, value in values.items()]
+            for name, values in totals.items()
+        }})
+        for pid in folded:
+            try:
+                os.remove(os.path.join(directory, f'{pid}.json'))
+            except FileNotFoundError:
+                pass
+
+    def fold(self, directory=None, pids=None):
+        """Переносит файлы мёртвых процессов (или процессов pids) в
+        folded.json и удаляет их; gauges при этом отбрасываются."""
+        directory = directory or self.get_directory()
+        os.makedirs(directory, exist_ok=True)
+        with _locked(directory):
+            self._fold(directory, pids)
+
+    def aggregate(self, directory=None):
+        """{имя: {метки: значение}} по файлам всех процессов."""
+        directory = directory or self.get_directory()
+        os.makedirs(directory, exist_ok=True)
+        totals = {name: {} for name in self._metrics}
+        with _locked(directory):
+            self._fold(directory)
+            for pid, data in self._read(directory):
+                alive = pid is not None and _is_alive(pid)
+                self._merge(totals, data, alive)
+        return totals
+
+    def render(self, directory=None):
+        """Текст в формате Prometheus 0.0.4."""
+        lines = []
+        totals = self.aggregate(directory)
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(totals[name].items()):
+                for suffix, labels, number in metric.samples(key, value):
+                    text = ','.join(
+                        f'{label}="{_escape(str(val))}"'
+                        for label, val in labels.items()
+                    )
+                    lines.append(
+                        f'{name}{suffix}'
+                        f'{"{" + text + "}" if text else ""} {number}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+maybe_flush = registry.maybe_flush
+
+# После fork дочерний процесс начинает с нуля: значения родителя
+# остаются в файле родителя.
+os.register_at_fork(after_in_child=registry.reset)
+
+REQUESTS = counter(
+    'http_requests_total', 'HTTP-запросы.', ('view', 'method', 'status')
+)
+REQUEST_SECONDS = histogram(
+    'http_request_duration_seconds', 'Время ответа.', ('view', 'method')
+)
+REQUEST_QUERIES = histogram(
+    'http_request_queries', 'SQL-запросов на HTTP-запрос.', ('view',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_QUERY_SECONDS = histogram(
+    'db_query_duration_seconds', 'Время SQL-запроса.', ('alias',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1),
+)
+
+
+class QueryMetrics:
+    """execute_wrapper: время каждого запроса и их число за HTTP-запрос."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            DB_QUERY_SECONDS.observe(
+                time.perf_counter() - start,
+                alias=context['connection'].alias,
+            )
@@ -0,0 +1,39 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from core import metrics
+
+
+class MetricsMiddleware:
+    """Время ответа, статусы и SQL-запросы по представлениям.
+
+    Стоит первым в MIDDLEWARE, чтобы учитывать и ответы из кэша
+    страниц (представление page_cache — это AnonymousPageCacheMiddleware).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = metrics.QueryMetrics()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        view = getattr(request, 'metrics_view', None)
+        if view is None:
+            match = request.resolver_match
+            view = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.REQUEST_SECONDS.observe(
+            duration, view=view, method=request.method
+        )
+        metrics.REQUEST_QUERIES.observe(queries.count, view=view)
+        metrics.maybe_flush()
+        return response
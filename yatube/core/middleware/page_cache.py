@@ -0,0 +1,132 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.module_loading import import_string
+
+from core import db_router, metrics
+
+PREFIX = 'page_cache:'
+# Ответ с Vary по другим заголовкам пришлось бы различать и в ключе.
+ALLOWED_VARY = {'cookie'}
+
+PAGE_CACHE = metrics.counter(
+    'page_cache_requests_total',
+    'Анонимные запросы к кэшируемым страницам: hit, miss, skip.',
+    ('result',),
+)
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых ответов для анонимных GET-запросов к PAGE_CACHE_VIEWS.
+
+    Стоит в MIDDLEWARE до сессий и аутентификации (раньше него только
+    метрики и журнал медленных запросов): попадание отдаётся без
+    сессии, аутентификации, запросов к базе и шаблонов. Анонимный
+    запрос — без куки сессии и сообщений; остальные заголовки
+    Vary: Cookie на страницу не влияют.
+
+    Запись хранится вместе с версиями тегов страницы — их возвращают
+    функции PAGE_CACHE_TAGS и PAGE_CACHE_VERSIONS (для posts это
+    области и поколения posts.cache). Запись в базу сдвигает поколение,
+    и старая запись больше не совпадает — так работает сброс по тегу.
+
+    Не кэшируются ответы, которые ставят куки (в том числе CSRF), с
+    Cache-Control: no-store и с Vary по другим заголовкам, а также
+    ответы, для которых код выставил request.no_page_cache. Остальные
+    заголовки сохраняются как есть: private/no-cache страниц posts
+    относятся к браузеру, а ETag проверяется и при попадании.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = set(getattr(settings, 'PAGE_CACHE_VIEWS', ()))
+        self.timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+        self.get_tags = import_string(settings.PAGE_CACHE_TAGS)
+        self.get_versions = import_string(settings.PAGE_CACHE_VERSIONS)
+        self.skip_cookies = (
+            settings.SESSION_COOKIE_NAME,
+            getattr(settings, 'MESSAGES_COOKIE_NAME', 'messages'),
+        )
+
+    def __call__(self, request):
+        match = self.match(request)
+        if match is None:
+            return self.get_response(request)
+        # Свой request_scope: get_versions может перевести запрос на
+        # основную базу ещё до ReplicaMiddleware.
+        with db_router.request_scope():
+            return self.respond(request, match)
+
+    def respond(self, request, match):
+        key = self.make_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            versions, response = entry
+            if not versions or self.get_versions(*versions) == versions:
+                PAGE_CACHE.inc(result='hit')
+                request.metrics_view = 'page_cache'
+                return self.hit(request, response)
+        tags = self.get_tags(match)
+        # Версии читаются до представления: запись, случившаяся во
+        # время отрисовки, сделает сохранённый ответ устаревшим. Пока
+        # реплика может не знать о последнем сдвиге, get_versions
+        # переводит запрос на основную базу (posts.cache).
+        versions = self.get_versions(*tags) if tags else {}
+        response = self.get_response(request)
+        if (
+            tags is not None
+            and request.method == 'GET'
+            and self.is_cacheable(request, response)
+        ):
+            cache.set(key, (versions, response), self.timeout)
+            response['X-Page-Cache'] = 'miss'
+            PAGE_CACHE.inc(result='miss')
+        else:
+            PAGE_CACHE.inc(result='skip')
+        return response
+
+    def match(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if any(name in request.COOKIES for name in self.skip_cookies):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        return match if match.view_name in self.views else None
+
+    def make_key(self, request):
+        url = request.build_absolute_uri()
+        return PREFIX + hashlib.md5(url.encode()).hexdigest()
+
+    def is_cacheable(self, request, response):
+        if response.status_code != 200 or response.streaming:
+            return False
+        if getattr(request, 'no_page_cache', False):
+            return False
+        if response.cookies or request.META.get('CSRF_COOKIE_USED'):
+            return False
+        if 'no-store' in response.get('Cache-Control', ''):
+            return False
+        vary = {
+            header.strip().lower()
+            for header in response.get('Vary', '').split(',')
+            if header.strip()
+        }
+        return vary <= ALLOWED_VARY
+
+    def hit(self, request, response):
+        response['X-Page-Cache'] = 'hit'
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
@@ -0,0 +1,47 @@
+import cProfile
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import profiling
+from core.query_budget import record_queries
+
+
+class ProfilerMiddleware:
+    """Выполняет выбранные запросы под cProfile (см. core.profiling).
+
+    Включается PROFILER_ENABLED; без него Django убирает middleware из
+    цепочки, и остальные запросы ничего не платят.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        profiling.save(profile, {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'created': time.time(),
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 3),
+            'sql_top': recorder.fingerprints.most_common(5),
+        })
+        return response
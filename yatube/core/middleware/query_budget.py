@@ -0,0 +1,23 @@
+from django.conf import settings
+
+from core.query_budget import check_budget, record_queries
+
+
+class QueryBudgetMiddleware:
+    """Сверяет запросы представления с его бюджетом (см. query_budget)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            return self.get_response(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None:
+            check_budget(budget, recorder, request.resolver_match.view_name)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
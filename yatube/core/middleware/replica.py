@@ -0,0 +1,46 @@
+from django.conf import settings
+
+from core import db_router
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaMiddleware:
+    """Читает с реплик в представлениях REPLICA_READ_VIEWS и закрепляет
+    за основной базой пользователя, который только что что-то записал.
+
+    Стоит до SessionMiddleware, чтобы запись сессии (вход на сайт) тоже
+    считалась записью.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(
+            settings, 'REPLICA_PIN_COOKIE', 'pin_primary'
+        )
+
+    def __call__(self, request):
+        with db_router.request_scope():
+            response = self.get_response(request)
+            wrote = db_router.wrote()
+        if wrote:
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 15),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not db_router.get_replicas():
+            return
+        module = getattr(view_func, '__module__', '')
+        prefixes = tuple(getattr(settings, 'REPLICA_READ_VIEWS', ()))
+        if (
+            request.method in SAFE_METHODS
+            and self.cookie_name not in request.COOKIES
+            and module.startswith(prefixes)
+        ):
+            db_router.read_from_replicas()
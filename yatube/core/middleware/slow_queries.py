@@ -0,0 +1,15 @@
+from core import slow_queries
+
+
+class SlowQueryMiddleware:
+    """Путь и имя представления для журнала медленных запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slow_queries.request_context(request.path):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.set_view(request.resolver_match.view_name)
@@ -0,0 +1,144 @@
+"""Выборочное профилирование запросов (ProfilerMiddleware).
+
+Под cProfile выполняется доля PROFILER_SAMPLE_RATE запросов и запросы
+с подписанным заголовком PROFILER_HEADER (значение — make_token()).
+Каждый замер — два файла в PROFILER_DIR: статистика pstats (.prof) и
+описание (.json) с именем представления, временем ответа, временем
+SQL и отрисовки шаблонов. Самые старые замеры сверх PROFILER_MAX_FILES
+удаляются.
+"""
+import json
+import os
+import pstats
+import random
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.template.base import Template
+
+SALT = 'core.profiling'
+TOKEN_VALUE = 'profile'
+# Template.render вызывается и для {% include %}, но cProfile считает
+# время рекурсивных вызовов в cumtime только один раз.
+TEMPLATE_RENDER = (
+    Template.render.__code__.co_filename,
+    Template.render.__code__.co_firstlineno,
+    Template.render.__name__,
+)
+
+
+def get_directory():
+    return settings.PROFILER_DIR
+
+
+def make_token():
+    """Значение заголовка PROFILER_HEADER для профилирования запроса."""
+    return signing.TimestampSigner(salt=SALT).sign(TOKEN_VALUE)
+
+
+def is_valid_token(token):
+    max_age = getattr(settings, 'PROFILER_TOKEN_MAX_AGE', 60 * 60 * 24)
+    try:
+        value = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=max_age
+        )
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def should_profile(request):
+    header = getattr(settings, 'PROFILER_HEADER', 'X-Profile')
+    token = request.META.get('HTTP_' + header.upper().replace('-', '_'))
+    if token:
+        return is_valid_token(token)
+    return random.random() < getattr(settings, 'PROFILER_SAMPLE_RATE', 0)
+
+
+def template_seconds(stats):
+    """Время отрисовки шаблонов в замере, секунды."""
+    row = stats.stats.get(TEMPLATE_RENDER)
+    return row[3] if row else 0.0
+
+
+def save(profile, meta, directory=None):
+    """Записывает замер и удаляет самые старые сверх PROFILER_MAX_FILES."""
+    directory = directory or get_directory()
+    os.makedirs(directory, exist_ok=True)
+    view = (meta['view'] or 'unknown').replace(':', '.').replace('/', '_')
+    name = f'{time.time():.6f}-{os.getpid()}-{view}'
+    stats = pstats.Stats(profile)
+    meta['template_ms'] = round(template_seconds(stats) * 1000, 3)
+    stats.dump_stats(os.path.join(directory, name + '.prof'))
+    with open(os.path.join(directory, name + '.json'), 'w') as stream:
+        json.dump(meta, stream, ensure_ascii=False)
+    rotate(directory)
+    return name
+
+
+def _names(directory):
+    try:
+        files = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    # Имена начинаются со времени замера, поэтому сортируются по нему.
+    return sorted(
+        name[:-len('.json')] for name in files if name.endswith('.json')
+    )
+
+
+def rotate(directory, max_files=None):
+    if max_files is None:
+        max_files = getattr(settings, 'PROFILER_MAX_FILES', 500)
+    names = _names(directory)
+    for name in names[:max(len(names) - max_files, 0)]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def load_samples(directory=None, view=None):
+    """Пары (описание, путь к .prof) сохранённых замеров."""
+    directory = directory or get_directory()
+    samples = []
+    for name in _names(directory):
+        path = os.path.join(directory, name)
+        try:
+            with open(path + '.json') as stream:
+                meta = json.load(stream)
+        except (FileNotFoundError, ValueError):
+            continue
+        if view is None or meta.get('view') == view:
+            samples.append((meta, path + '.prof'))
+    return samples
+
+
+def hot_functions(paths, sort='tottime', limit=20):
+    """Самые дорогие функции по всем замерам paths.
+
+    Возвращает строки (функция, вызовов, tottime, cumtime) в секундах.
+    """
+    stats = pstats.Stats(*paths)
+    column = {'tottime': 2, 'cumtime': 3}[sort]
+    rows = sorted(
+        stats.stats.items(), key=lambda item: item[1][column], reverse=True
+    )
+    return [
+        (_label(func), calls, tottime, cumtime)
+        for func, (_, calls, tottime, cumtime, _) in rows[:limit]
+    ]
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        filename = filename[len(base):]
+    elif 'site-packages' + os.sep in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f'{filename}:{line}({name})'
@@ -0,0 +1,131 @@
+"""Бюджет SQL-запросов на представление и поиск N+1.
+
+Представление объявляет бюджет декоратором query_budget, а
+QueryBudgetMiddleware считает запросы, их суммарное время и повторы
+одного и того же запроса (отпечатка) за весь HTTP-запрос.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+SPACES = re.compile(r'\s+')
+# Точки сохранения transaction.atomic() — не запросы к данным: их число
+# зависит от того, вложен ли atomic во внешнюю транзакцию (в тестах).
+TRANSACTION_CONTROL = (
+    'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление вышло за объявленный бюджет запросов."""
+
+
+def fingerprint(sql):
+    """Нормализованный текст запроса без значений параметров."""
+    return IN_LIST.sub('(%s...)', SPACES.sub(' ', sql).strip())
+
+
+class QueryRecorder:
+    """execute_wrapper, который считает запросы и их отпечатки."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(TRANSACTION_CONTROL):
+            return execute(sql, params, many, context)
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """Отпечатки, выполненные threshold и более раз (признак N+1)."""
+        return {
+            sql: times for sql, times in self.fingerprints.items()
+            if times >= threshold
+        }
+
+
+@contextmanager
+def record_queries():
+    """Записывает запросы ко всем базам внутри блока with."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+class Budget:
+    def __init__(self, queries, duration=None, repeats=None):
+        self.queries = queries
+        self.duration = duration
+        self.repeats = repeats or getattr(
+            settings, 'QUERY_BUDGET_REPEATS', 3
+        )
+
+    def violations(self, recorder):
+        """Список нарушений бюджета в человекочитаемом виде."""
+        problems = []
+        if recorder.count > self.queries:
+            problems.append(
+                f'{recorder.count} queries (budget {self.queries})'
+            )
+        if self.duration is not None and recorder.duration > self.duration:
+            problems.append(
+                f'{recorder.duration:.3f}s of SQL (budget {self.duration}s)'
+            )
+        for sql, times in recorder.repeated(self.repeats).items():
+            problems.append(f'{times} repeats of: {sql[:200]}')
+        return problems
+
+
+def query_budget(queries, duration=None, repeats=None):
+    """Объявляет бюджет запросов для представления.
+
+    В бюджет входят все запросы HTTP-запроса, включая загрузку сессии
+    и пользователя.
+    """
+    def decorator(view_func):
+        view_func.query_budget = Budget(queries, duration, repeats)
+        return view_func
+    return decorator
+
+
+def check_budget(budget, recorder, view_name):
+    """Логирует или бросает исключение, если бюджет превышен."""
+    problems = budget.violations(recorder)
+    if not problems:
+        return
+    message = f'{view_name} is over its query budget: ' + '; '.join(problems)
+    if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def within_budget(queries, duration=None, repeats=None):
+    """Тестовый помощник: блок with должен уложиться в бюджет.
+
+        with within_budget(3):
+            list(Post.objects.select_related('author'))
+    """
+    with record_queries() as recorder:
+        yield recorder
+    problems = Budget(queries, duration, repeats).violations(recorder)
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
@@ -0,0 +1,118 @@
+"""Журнал медленных SQL-запросов с привязкой к представлению.
+
+install() добавляет execute_wrapper каждому новому соединению, поэтому
+в журнал попадают и запросы вне HTTP (команды, фоновые потоки).
+Запрос дольше SLOW_QUERY_THRESHOLD_MS записывается строкой JSON в
+логгер core.slow_queries (в settings — RotatingFileHandler с файлом
+SLOW_QUERY_LOG): представление и путь (их выставляет
+SlowQueryMiddleware), отпечаток запроса, число параметров,
+длительность и короткий стек кода проекта, который выполнил запрос.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from core.query_budget import fingerprint
+
+logger = logging.getLogger(__name__)
+
+_context = threading.local()
+
+
+@contextmanager
+def request_context(path):
+    """Путь HTTP-запроса для записей журнала; представление — set_view."""
+    _context.path, _context.view = path, None
+    try:
+        yield
+    finally:
+        _context.path = _context.view = None
+
+
+def set_view(view):
+    _context.view = view
+
+
+def get_stack(limit=None):
+    """Кадры кода проекта (без библиотек), ближайший к запросу — последний."""
+    if limit is None:
+        limit = getattr(settings, 'SLOW_QUERY_STACK_DEPTH', 5)
+    base = str(settings.BASE_DIR) + os.sep
+    frames = []
+    for frame in traceback.extract_stack()[:-1]:
+        if (
+            not frame.filename.startswith(base)
+            or 'site-packages' in frame.filename
+            or frame.filename == __file__
+        ):
+            continue
+        frames.append(
+            f'{frame.filename[len(base):]}:{frame.lineno} in {frame.name}'
+        )
+    return frames[-limit:]
+
+
+class SlowQueryLogger:
+    """execute_wrapper, который пишет в журнал запросы дольше порога."""
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+            if threshold is not None and duration >= threshold:
+                self.log(sql, params, many, context, duration)
+
+    def log(self, sql, params, many, context, duration):
+        logger.warning(json.dumps({
+            'time': time.time(),
+            'alias': context['connection'].alias,
+            'view': getattr(_context, 'view', None),
+            'path': getattr(_context, 'path', None),
+            'fingerprint': fingerprint(sql),
+            'params': len(params or ()),
+            'many': many,
+            'duration_ms': round(duration, 3),
+            'stack': get_stack(),
+        }, ensure_ascii=False))
+
+
+def install(sender, connection, **kwargs):
+    """connection_created: подключает SlowQueryLogger к соединению."""
+    if not any(
+        isinstance(wrapper, SlowQueryLogger)
+        for wrapper in connection.execute_wrappers
+    ):
+        # В начало списка: соединение может открыться внутри
+        # connection.execute_wrapper(), который при выходе снимает
+        # последний элемент.
+        connection.execute_wrappers.insert(0, SlowQueryLogger())
+
+
+def read_log(path=None):
+    """Записи журнала и его ротированных копий, старые сначала."""
+    path = path or settings.SLOW_QUERY_LOG
+    paths = [path]
+    num = 1
+    while os.path.exists(f'{path}.{num}'):
+        paths.append(f'{path}.{num}')
+        num += 1
+    for current in reversed(paths):
+        try:
+            stream = open(current, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with stream:
+            for line in stream:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import runner
+from django.test.utils import override_settings
+
+# Каталог прогона; процессы --parallel создают в нём свои подкаталоги.
+_directory = None
+
+
+def get_test_settings(directory):
+    return {
+        'CACHES': {
+            **settings.CACHES,
+            'default': {
+                **settings.CACHES['default'],
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            },
+        },
+        'METRICS_DIR': os.path.join(directory, 'metrics'),
+    }
+
+
+def _init_worker(counter):
+    """Как у Django: своя копия базы, а ещё свои кэш и METRICS_DIR."""
+    runner._init_worker(counter)
+    directory = os.path.join(_directory, f'worker_{runner._worker_id}')
+    os.makedirs(directory, exist_ok=True)
+    override_settings(**get_test_settings(directory)).enable()
+
+
+class ParallelTestSuite(runner.ParallelTestSuite):
+    init_worker = _init_worker
+
+
+class TestRunner(runner.DiscoverRunner):
+    """DiscoverRunner, у которого кэш и метрики — во временном каталоге.
+
+    Кэш и METRICS_DIR из settings общие для хоста: без подмены
+    cache.clear() в тестах очищал бы кэш запущенного сайта, ключи одного
+    прогона доставались бы следующему, а счётчики тестовых запросов
+    попадали бы в /metrics. При --parallel у каждого процесса свой
+    подкаталог: иначе тесты одного процесса видели бы кэш и метрики
+    другого.
+    """
+
+    parallel_test_suite = ParallelTestSuite
+
+    def setup_test_environment(self, **kwargs):
+        global _directory
+        super().setup_test_environment(**kwargs)
+        _directory = tempfile.mkdtemp(prefix='yatube_tests_')
+        self.test_settings = override_settings(
+            **get_test_settings(_directory)
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,118 @@
+# core/tests/test_cache_backends.py
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.cache_backends.sqlite import SQLiteCache
+
+
+def _set_in_child(cache):
+    """Пишет в кэш из дочернего процесса; возвращает pid ребёнка.
+
+    os.fork, а не multiprocessing: процессам --parallel, демонам пула,
+    multiprocessing не даёт заводить детей.
+    """
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            cache.set('from_child', 'value')
+            cache.incr('counter', 5)
+            code = 0
+        finally:
+            os._exit(code)
+    return pid
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """Кэш-бэкенд на SQLite, общий для процессов."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Значения любых типов читаются так же, как записаны."""
+        values = {'int': 7, 'str': 'строка', 'set': frozenset({1, 2}),
+                  'bool': True, 'none': None}
+        for key, value in values.items():
+            self.cache.set(key, value)
+        for key, value in values.items():
+            with self.subTest(key=key):
+                self.assertEqual(self.cache.get(key, 'missing'), value)
+                self.assertIs(type(self.cache.get(key)), type(value))
+        self.cache.delete('int')
+        self.assertIsNone(self.cache.get('int'))
+
+    def test_expiry(self):
+        """Истёкшие записи не читаются и не мешают add."""
+        self.cache.set('key', 'old', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr(self):
+        """incr атомарен и требует существующего ключа."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.decr('counter', 2), 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_many(self):
+        """get_many и set_many работают пачкой."""
+        cache = self.make_cache(MAX_ENTRIES=5000)
+        data = {f'key:{num}': num for num in range(1200)}
+        self.assertEqual(cache.set_many(data), [])
+        found = cache.get_many([*data, 'missing'])
+        self.assertEqual(found, data)
+        cache.delete_many(list(data)[:600])
+        self.assertEqual(len(cache.get_many(data)), 600)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_EVERY=1, TOUCH_INTERVAL=0
+        )
+        for num in range(10):
+            cache.set(f'key:{num}', num)
+        # Читаем первые ключи: теперь давно не читанные — остальные.
+        cache.get_many([f'key:{num}' for num in range(3)])
+        cache.set('key:new', 'new')
+        for num in range(3):
+            self.assertEqual(cache.get(f'key:{num}'), num)
+        self.assertEqual(cache.get('key:new'), 'new')
+        remaining = cache.get_many([f'key:{num}' for num in range(10)])
+        self.assertLessEqual(len(remaining), 6)
+
+    def test_shared_between_processes(self):
+        """Запись в дочернем процессе видна в родительском."""
+        self.cache.set('counter', 1)
+        _, status = os.waitpid(_set_in_child(self.cache), 0)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+        self.assertEqual(self.cache.get('from_child'), 'value')
+        self.assertEqual(self.make_cache().get('counter'), 6)
+
+
+class TestCacheLocationTests(SimpleTestCase):
+    def test_tests_use_own_cache(self):
+        """Тесты не трогают общий кэш хоста."""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            location,
+            os.path.join(tempfile.gettempdir(), 'yatube_cache.sqlite3'),
+        )
+        self.assertEqual(cache._path, os.path.abspath(location))
@@ -0,0 +1,91 @@
+# core/tests/test_db.py
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.db import (
+    WRITE_METHODS, configure_sqlite, is_locked_error, retry_on_locked,
+)
+
+
+class ConfigureSQLiteTests(TestCase):
+    """PRAGMA из SQLITE_PRAGMAS применяются к соединению."""
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_pragmas(self):
+        configure_sqlite(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_pragmas_not_counted(self):
+        """PRAGMA нового соединения не видны execute_wrapper'ам."""
+        with CaptureQueriesContext(connection) as queries:
+            configure_sqlite(sender=None, connection=connection)
+        self.assertEqual(len(queries), 0)
+
+    def test_transaction_mode(self):
+        with override_settings(SQLITE_TRANSACTION_MODE='WHENEVER'):
+            with self.assertRaises(ValueError):
+                connection._start_transaction_under_autocommit()
+
+
+@mock.patch('core.db.time.sleep')
+class RetryOnLockedTests(TestCase):
+    """Пишущее представление повторяется, пока база занята."""
+
+    def call(self, *errors, attempts=3, method='post', **kwargs):
+        calls = []
+
+        @retry_on_locked(attempts=attempts, **kwargs)
+        def view(request):
+            calls.append(request)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return HttpResponse('ok')
+
+        request = getattr(RequestFactory(), method)('/')
+        return view(request), calls
+
+    def test_retries_locked(self, sleep):
+        locked = OperationalError('database is locked')
+        with self.assertLogs('core.db', 'INFO'):
+            response, calls = self.call(locked, locked)
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_gives_up(self, sleep):
+        locked = OperationalError('database is locked')
+        with self.assertLogs('core.db', 'INFO'):
+            with self.assertRaises(OperationalError):
+                self.call(locked, locked, attempts=2)
+
+    def test_other_errors(self, sleep):
+        with self.assertRaises(OperationalError):
+            self.call(OperationalError('no such table: posts_post'))
+        sleep.assert_not_called()
+
+    def test_safe_methods_not_wrapped(self, sleep):
+        """GET формы не открывает пишущую транзакцию."""
+        for method, methods, expected in (
+            ('post', WRITE_METHODS, True),
+            ('get', WRITE_METHODS, False),
+            ('get', ('GET',), True),
+        ):
+            with self.subTest(method=method, methods=methods):
+                with mock.patch(
+                    'core.db.transaction.atomic', wraps=transaction.atomic
+                ) as atomic:
+                    self.call(method=method, methods=methods)
+                self.assertEqual(atomic.called, expected)
+
+    def test_is_locked_error(self, sleep):
+        self.assertTrue(is_locked_error(
+            OperationalError('Database table is locked: posts_post')
+        ))
+        self.assertFalse(is_locked_error(OperationalError('disk I/O error')))
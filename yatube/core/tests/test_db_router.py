@@ -0,0 +1,113 @@
+# core/tests/test_db_router.py
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import db_router
+from core.middleware.replica import ReplicaMiddleware
+from posts import cache as posts_cache
+from posts.conditional import conditional_page
+from posts.models import Post
+
+ROUTER = db_router.ReplicaRouter()
+
+
+def read_view(request):
+    request.databases = [ROUTER.db_for_read(Post)]
+    return HttpResponse()
+
+
+def write_view(request):
+    request.databases = [ROUTER.db_for_read(Post)]
+    ROUTER.db_for_write(Post)
+    request.databases.append(ROUTER.db_for_read(Post))
+    return HttpResponse()
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'],
+    REPLICA_READ_VIEWS=('core.tests.',),
+    REPLICA_PIN_COOKIE='pin_primary',
+)
+class ReplicaRouterTests(SimpleTestCase):
+    """Маршрутизация чтения на реплики и закрепление после записи."""
+
+    def request(self, view, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        return request, middleware(request)
+
+    def test_reads_go_to_replica(self):
+        """GET-представление читает реплику и не получает куку."""
+        request, response = self.request(read_view)
+        self.assertEqual(request.databases, ['replica'])
+        self.assertNotIn('pin_primary', response.cookies)
+
+    def test_write_pins_primary(self):
+        """После записи запрос читает основную базу, а браузер — куку."""
+        request, response = self.request(write_view)
+        self.assertEqual(request.databases, ['replica', 'default'])
+        self.assertEqual(response.cookies['pin_primary']['max-age'], 15)
+
+    def test_pinned_by_cookie(self):
+        """С кукой недавней записи чтение идёт в основную базу."""
+        request, _ = self.request(read_view, cookies={'pin_primary': '1'})
+        self.assertEqual(request.databases, ['default'])
+
+    def test_unsafe_method_uses_primary(self):
+        """POST читает основную базу."""
+        request, _ = self.request(read_view, method='post')
+        self.assertEqual(request.databases, ['default'])
+
+    def test_other_views_use_primary(self):
+        """Представления вне REPLICA_READ_VIEWS читают основную базу."""
+        with override_settings(REPLICA_READ_VIEWS=('posts.',)):
+            request, _ = self.request(read_view)
+        self.assertEqual(request.databases, ['default'])
+
+    def test_outside_requests(self):
+        """Команды и фоновые потоки работают с основной базой."""
+        self.assertEqual(ROUTER.db_for_read(Post), 'default')
+        with db_router.request_scope():
+            db_router.read_from_replicas()
+            with db_router.pin_primary():
+                self.assertEqual(ROUTER.db_for_read(Post), 'default')
+            self.assertEqual(ROUTER.db_for_read(Post), 'replica')
+        self.assertEqual(ROUTER.db_for_read(Post), 'default')
+
+    def test_recent_generation_uses_primary(self):
+        """Страница с ETag из поколения читает реплику, а после недавнего
+        сдвига поколения — основную базу."""
+        scope = 'router:test'
+        view = conditional_page(
+            lambda request: str(posts_cache.get_generation(scope))
+        )(read_view)
+        cache.delete(posts_cache.RECENT_PREFIX + scope)
+        request, _ = self.request(view)
+        self.assertEqual(request.databases, ['replica'])
+        posts_cache.bump(scope)
+        request, _ = self.request(view)
+        self.assertEqual(request.databases, ['default'])
+
+    def test_primary_kept_in_nested_scope(self):
+        """read_from_primary() внешнего request_scope не сбрасывается
+        вложенным (AnonymousPageCacheMiddleware и ReplicaMiddleware)."""
+        with db_router.request_scope():
+            db_router.read_from_primary()
+            with db_router.request_scope():
+                db_router.read_from_replicas()
+                self.assertEqual(ROUTER.db_for_read(Post), 'default')
+        with db_router.request_scope():
+            db_router.read_from_replicas()
+            self.assertEqual(ROUTER.db_for_read(Post), 'replica')
+
+    def test_replicas_not_migrated(self):
+        """Миграции применяются только к основной базе."""
+        self.assertFalse(ROUTER.allow_migrate('replica', 'posts'))
+        self.assertIsNone(ROUTER.allow_migrate('default', 'posts'))
@@ -0,0 +1,161 @@
+# core/tests/test_metrics.py
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import Registry
+
+METRICS_DIR = tempfile.mkdtemp()
+DEAD_PID = 2 ** 22 + 1
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTests(TestCase):
+    """Счётчики, gauges и гистограммы и их сводка по процессам."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        self.registry = Registry()
+        self.requests = self.registry.counter(
+            'requests_total', 'Запросы.', ('view',)
+        )
+        self.pending = self.registry.gauge('pending', 'Очередь.')
+        self.seconds = self.registry.histogram(
+            'seconds', 'Время.', buckets=(0.1, 1)
+        )
+
+    def dead_process(self, data, pid=DEAD_PID):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{pid}.json')
+        with open(path, 'w') as stream:
+            json.dump(data, stream)
+
+    def test_render(self):
+        self.requests.inc(view='index')
+        self.requests.inc(2, view='index')
+        self.pending.set(4)
+        self.seconds.observe(0.05)
+        self.seconds.observe(0.5)
+        self.seconds.observe(5)
+        self.registry.flush()
+        text = self.registry.render()
+        for line in (
+            '# TYPE requests_total counter',
+            'requests_total{view="index"} 3',
+            'pending 4',
+            'seconds_bucket{le="0.1"} 1',
+            'seconds_bucket{le="1"} 2',
+            'seconds_bucket{le="+Inf"} 3',
+            'seconds_sum 5.55',
+            'seconds_count 3',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line + '\n', text)
+
+    def test_processes_aggregated(self):
+        """Счётчики мёртвых процессов суммируются, gauges — нет."""
+        self.requests.inc(view='index')
+        self.pending.set(1)
+        self.seconds.observe(0.5)
+        self.registry.flush()
+        self.dead_process({
+            'requests_total': [[['index'], 5], [['group'], 1]],
+            'pending': [[[], 10]],
+            'seconds': [[[], [[1, 0, 0], 0.01]]],
+        })
+        totals = self.registry.aggregate()
+        self.assertEqual(
+            totals['requests_total'], {('index',): 6, ('group',): 1}
+        )
+        self.assertEqual(totals['pending'], {(): 1})
+        self.assertEqual(totals['seconds'], {(): [[1, 1, 0], 0.51]})
+
+    def test_dead_processes_folded(self):
+        """Файл мёртвого процесса переносится в сводку и удаляется."""
+        self.dead_process({'requests_total': [[['index'], 5]]})
+        self.registry.aggregate()
+        self.dead_process({'requests_total': [[['index'], 2]]}, DEAD_PID + 1)
+        totals = self.registry.aggregate()
+        self.assertEqual(totals['requests_total'], {('index',): 7})
+        self.assertEqual(os.listdir(METRICS_DIR).count('folded.json'), 1)
+        self.assertFalse(any(
+            name.startswith(str(DEAD_PID)) for name in os.listdir(METRICS_DIR)
+        ))
+        self.assertEqual(self.registry.aggregate(), totals)
+
+    def test_reused_pid(self):
+        """Файл мёртвого процесса с тем же pid не затирается."""
+        self.dead_process({'requests_total': [[['index'], 5]]}, os.getpid())
+        self.requests.inc(view='index')
+        self.registry.flush()
+        self.registry.flush()
+        totals = self.registry.aggregate()
+        self.assertEqual(totals['requests_total'], {('index',): 6})
+
+    def test_wrong_labels(self):
+        with self.assertRaises(ValueError):
+            self.requests.inc(page='index')
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_metrics_page(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        for name in (
+            'http_requests_total{view="posts:index",method="GET",'
+            'status="200"}',
+            'http_requests_total{view="page_cache",method="GET",'
+            'status="200"}',
+            'http_request_duration_seconds_bucket{view="posts:index"',
+            'db_query_duration_seconds_count{alias="default"}',
+            'page_cache_requests_total{result="hit"}',
+            'posts_cache_fill_total{fragment="index_page",event="miss"}',
+        ):
+            with self.subTest(name=name):
+                self.assertContains(response, name)
+
+    @override_settings(METRICS_ALLOWED_IPS=('10.0.0.1',))
+    def test_forbidden(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_forbidden_through_proxy(self):
+        """Запрос через локальный прокси без токена не пускается."""
+        response = self.client.get(
+            reverse('metrics'), HTTP_X_FORWARDED_FOR='203.0.113.5'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        """С METRICS_TOKEN нужен заголовок Authorization."""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer secret',
+            HTTP_X_FORWARDED_FOR='203.0.113.5',
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,81 @@
+# core/tests/test_page_cache.py
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Кэш целых страниц для анонимов и сброс по тегам."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Первый пост'
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('about:author'),
+        )
+
+    def test_hit_without_queries(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first['X-Page-Cache'], 'miss')
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second['X-Page-Cache'], 'hit')
+                self.assertEqual(second.content, first.content)
+
+    def test_purged_on_new_post(self):
+        for url in self.urls[:3]:
+            self.client.get(url)
+        Post.objects.create(
+            author=self.user, group=self.group, text='Второй пост'
+        )
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'Второй пост')
+
+    def test_post_purged_on_comment(self):
+        url = self.urls[3]
+        self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.assertContains(self.client.get(url), 'Комментарий')
+
+    def test_other_group_kept(self):
+        url = self.urls[1]
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+
+    def test_logged_in_not_cached(self):
+        self.client.force_login(self.user)
+        for _ in range(2):
+            response = self.client.get(self.urls[0])
+            self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_not_modified_on_hit(self):
+        etag = self.client.get(self.urls[0])['ETag']
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_page_not_cached(self):
+        url = reverse('posts:profile', kwargs={'username': 'nobody'})
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse(response.has_header('X-Page-Cache'))
@@ -0,0 +1,77 @@
+# core/tests/test_profiling.py
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from posts.models import Post, User
+
+PROFILER_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    PROFILER_ENABLED=True,
+    PROFILER_SAMPLE_RATE=0,
+    PROFILER_DIR=PROFILER_DIR,
+    PROFILER_MAX_FILES=2,
+    MIDDLEWARE=[
+        'core.middleware.profiler.ProfilerMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+    ],
+)
+class ProfilerTests(TestCase):
+    """Выборочное профилирование и сводка по замерам."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+        user = User.objects.create_user(username='author')
+        Post.objects.create(author=user, text='Пост')
+        self.url = reverse('posts:index')
+
+    def profiled_get(self, token=None):
+        return self.client.get(
+            self.url, HTTP_X_PROFILE=token or profiling.make_token()
+        )
+
+    def test_not_sampled(self):
+        self.client.get(self.url)
+        self.assertEqual(profiling.load_samples(), [])
+
+    def test_bad_token(self):
+        self.profiled_get('profile:forged:signature')
+        self.assertEqual(profiling.load_samples(), [])
+
+    def test_sample_saved(self):
+        self.assertEqual(self.profiled_get().status_code, 200)
+        [(meta, path)] = profiling.load_samples()
+        self.assertEqual(meta['view'], 'posts:index')
+        self.assertGreater(meta['sql_count'], 0)
+        self.assertGreater(meta['template_ms'], 0)
+        self.assertTrue(os.path.exists(path))
+
+    def test_rotation(self):
+        for _ in range(3):
+            self.profiled_get()
+        self.assertEqual(len(profiling.load_samples()), 2)
+        self.assertEqual(len(os.listdir(PROFILER_DIR)), 4)
+
+    def test_report(self):
+        self.profiled_get()
+        self.profiled_get()
+        out = StringIO()
+        call_command('profile_report', '--limit', '5', stdout=out)
+        self.assertIn('posts:index: 2 замеров', out.getvalue())
+        self.assertIn('tottime', out.getvalue())
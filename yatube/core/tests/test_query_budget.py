@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from core.query_budget import QueryBudgetExceeded, fingerprint, within_budget
+from posts.models import Post, User
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth_user')
+        for num in range(5):
+            Post.objects.create(author=cls.user, text='Пост № %s' % num)
+
+    def test_fingerprint_collapses_in_lists(self):
+        """Списки IN (...) разной длины дают один отпечаток."""
+        self.assertEqual(
+            fingerprint('SELECT 1 WHERE id IN (%s, %s)'),
+            fingerprint('SELECT  1 WHERE id IN (%s, %s, %s)'),
+        )
+
+    def test_n_plus_one_detected(self):
+        """Повтор одного запроса на каждый объект превышает бюджет."""
+        with self.assertRaises(QueryBudgetExceeded):
+            with within_budget(10):
+                for post in Post.objects.all():
+                    post.author.username
+
+    def test_select_related_within_budget(self):
+        """С select_related список укладывается в один запрос."""
+        with within_budget(1) as recorder:
+            for post in Post.objects.select_related('author'):
+                post.author.username
+        self.assertEqual(recorder.count, 1)
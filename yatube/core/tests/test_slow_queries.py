@@ -0,0 +1,88 @@
+# core/tests/test_slow_queries.py
+import logging
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import slow_queries
+from posts.models import Post, User
+
+LOG_DIR = tempfile.mkdtemp()
+LOG_FILE = os.path.join(LOG_DIR, 'slow.log')
+
+
+@override_settings(SLOW_QUERY_LOG=LOG_FILE)
+class SlowQueryLogTests(TestCase):
+    """Журнал медленных запросов и сводка по нему."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(LOG_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        Post.objects.create(author=self.user, text='Пост')
+        # Вместо файла из settings.LOGGING — временный файл теста.
+        logger = logging.getLogger('core.slow_queries')
+        self.handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+        self.saved_handlers = logger.handlers
+        logger.handlers = [self.handler]
+        self.addCleanup(self.restore_handlers)
+
+    def restore_handlers(self):
+        logging.getLogger('core.slow_queries').handlers = self.saved_handlers
+        self.handler.close()
+        os.remove(LOG_FILE)
+
+    def test_wrapper_installed_once(self):
+        connection.ensure_connection()
+        slow_queries.install(None, connection)
+        self.assertEqual(
+            sum(
+                isinstance(wrapper, slow_queries.SlowQueryLogger)
+                for wrapper in connection.execute_wrappers
+            ),
+            1,
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_records_view_and_stack(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:follow_index'))
+        records = [
+            record for record in slow_queries.read_log()
+            if 'posts_post' in record['fingerprint']
+        ]
+        self.assertTrue(records)
+        record = records[0]
+        self.assertEqual(record['view'], 'posts:follow_index')
+        self.assertEqual(record['path'], reverse('posts:follow_index'))
+        self.assertIn('%s', record['fingerprint'])
+        self.assertGreater(record['params'], 0)
+        self.assertTrue(
+            any(frame.startswith('posts/') for frame in record['stack'])
+        )
+
+    def test_fast_queries_skipped(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(list(slow_queries.read_log()), [])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_summary(self):
+        self.client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command(
+            'slow_queries', '--view', 'posts:index', '--limit', '3',
+            stdout=out,
+        )
+        self.assertIn('posts:index', out.getvalue())
+        self.assertIn('SELECT', out.getvalue())
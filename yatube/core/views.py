@@ -1,6 +1,15 @@
 # core/views.py
 from http import HTTPStatus
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core import metrics
+
+# Заголовки, которые добавляет обратный прокси.
+PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP', 'HTTP_FORWARDED')
 
 
 def page_not_found(request, exception):
@@ -26,3 +35,33 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_allowed(request):
+    """Доступ к /metrics: адрес из METRICS_ALLOWED_IPS и токен.
+
+    За обратным прокси на той же машине REMOTE_ADDR всех запросов —
+    127.0.0.1, поэтому одного адреса мало. Если задан METRICS_TOKEN,
+    нужен заголовок Authorization: Bearer <токен>; без токена
+    пускаются только запросы без заголовков прокси.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return False
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+        )
+    return not any(header in request.META for header in PROXY_HEADERS)
+
+
+def metrics_view(request):
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    if not metrics_allowed(request):
+        return HttpResponse(status=HTTPStatus.FORBIDDEN)
+    metrics.registry.flush()
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Group, Post, Comment
 
 
@@ -10,6 +12,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE '%...%'."""
+        expression = search.parse_query(search_term)
+        if expression is None or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        sql, params = search.match_post_ids_sql(expression, posts_only=True)
+        return queryset.filter(pk__in=RawSQL(sql, params)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
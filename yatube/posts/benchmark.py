@@ -0,0 +1,316 @@
+"""Синтетические данные и замер задержек страниц posts.
+
+seed() строит правдоподобный набор данных: у авторов степенное
+распределение активности (немногие пишут большую часть постов и
+собирают большую часть подписчиков), даты постов размазаны по году.
+run() обходит страницы тестовым клиентом и считает перцентили
+времени ответа, число запросов и пиковую память.
+"""
+import datetime
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import accumulate
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache as django_cache
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from core.query_budget import record_queries
+
+from . import cache, counters, timeline
+from .models import Comment, Follow, Group, Post, User
+from .transfer import BATCH_SIZE, keep_dates
+
+PASSWORD = 'benchmark'
+PERCENTILES = (50, 95, 99)
+
+
+def _batches(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _top_pk(model):
+    return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+
+def _insert(model, objects, progress=None):
+    """bulk_create пачками; возвращает список id новых строк.
+
+    id читаются из базы, а не вычисляются: AUTOINCREMENT не выдаёт
+    повторно id удалённых строк, и в диапазоне «максимум + 1 ...» были бы
+    дыры.
+    """
+    previous = _top_pk(model)
+    name = model._meta.model_name
+    with keep_dates():
+        for batch in _batches(objects):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            if progress:
+                progress(name, len(batch))
+    return list(model.objects.filter(pk__gt=previous).order_by(
+        'pk'
+    ).values_list('pk', flat=True))
+
+
+def seed(users, posts, groups, comments, follows, alpha=1.2,
+         seed=None, progress=None):
+    """Создаёт набор данных; follows — среднее число подписок на человека.
+
+    Вероятность выбрать пользователя автором поста или целью подписки
+    пропорциональна его весу из распределения Парето с параметром alpha.
+    """
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    now = timezone.now()
+    year = datetime.timedelta(days=365).total_seconds()
+    password = make_password(PASSWORD)
+
+    first_user = _top_pk(User) + 1
+    user_ids = _insert(User, (
+        User(
+            username=f'bench_{first_user + num}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password=password,
+            date_joined=now,
+        )
+        for num in range(users)
+    ), progress)
+    weights = list(accumulate(
+        rng.paretovariate(alpha) for _ in user_ids
+    ))
+
+    first_group = _top_pk(Group) + 1
+    group_ids = _insert(Group, (
+        Group(
+            title=fake.catch_phrase()[:200],
+            slug=f'bench-{first_group + num}',
+            description=fake.paragraph(),
+        )
+        for num in range(groups)
+    ), progress)
+
+    def post_objects():
+        for _ in range(posts):
+            pub_date = now - datetime.timedelta(seconds=rng.random() * year)
+            yield Post(
+                author_id=rng.choices(user_ids, cum_weights=weights)[0],
+                group_id=(
+                    rng.choice(group_ids)
+                    if group_ids and rng.random() < 0.7 else None
+                ),
+                text=fake.paragraph(nb_sentences=rng.randint(1, 8)),
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+
+    post_ids = _insert(Post, post_objects(), progress)
+
+    def comment_objects():
+        for _ in range(comments if post_ids else 0):
+            yield Comment(
+                post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+                text=fake.sentence(),
+                created=now - datetime.timedelta(seconds=rng.random() * year),
+            )
+
+    _insert(Comment, comment_objects(), progress)
+
+    def follow_objects():
+        for user_id in user_ids:
+            count = min(int(rng.expovariate(1 / follows)), len(user_ids) - 1)
+            authors = set(rng.choices(user_ids, cum_weights=weights, k=count))
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    if follows and len(user_ids) > 1:
+        _insert(Follow, follow_objects(), progress)
+
+    # bulk_create не отправляет сигналы: производные данные — разом.
+    counters.rebuild()
+    timeline.rebuild()
+    cache.bump(cache.index_scope())
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+    }
+
+
+def get_targets():
+    """Страницы для замера на текущих данных: имя -> (url, params)."""
+    targets = {
+        'index': (reverse('posts:index'), None),
+        'index_page_50': (reverse('posts:index'), {'page': 50}),
+        'search': (reverse('posts:search'), {'q': 'на'}),
+        'api_post_list': (reverse('api:post_list'), None),
+    }
+    group = Group.objects.annotate(size=Count('posts')).order_by(
+        '-size'
+    ).first()
+    if group is not None:
+        targets['group_list'] = (
+            reverse('posts:group_list', kwargs={'slug': group.slug}), None
+        )
+    author = User.objects.filter(stats__isnull=False).order_by(
+        '-stats__posts_count'
+    ).first()
+    if author is not None:
+        targets['profile'] = (
+            reverse('posts:profile', kwargs={'username': author.username}),
+            None,
+        )
+    post = Post.objects.order_by('-comments_count').first()
+    if post is not None:
+        targets['post_detail'] = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}), None
+        )
+    targets['follow_index'] = (reverse('posts:follow_index'), None)
+    targets['api_follow'] = (reverse('api:follow_feed'), None)
+    return targets
+
+
+def get_reader():
+    """Пользователь с самой длинной лентой подписок."""
+    return User.objects.filter(stats__isnull=False).order_by(
+        '-stats__following_count'
+    ).first()
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, round(percent / 100 * len(ordered) + 0.5) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def measure(client, url, params, repeat, warmup, cold):
+    for _ in range(warmup):
+        client.get(url, params)
+    timings, queries = [], []
+    status = None
+    for _ in range(repeat):
+        if cold:
+            django_cache.clear()
+        with record_queries() as recorder:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            timings.append((time.perf_counter() - start) * 1000)
+        status = response.status_code
+        queries.append(recorder.count)
+    # Память меряется отдельным запросом: tracemalloc замедляет код.
+    if cold:
+        django_cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url, params)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        'url': url,
+        'params': params,
+        'status': status,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_queries': max(queries),
+        'mean_queries': round(statistics.mean(queries), 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(percentile(timings, percent), 3)
+    return result
+
+
+@contextmanager
+def private_cache():
+    """Кэш по умолчанию во временном каталоге на время замера.
+
+    Кэш из settings общий для хоста: --cold очищал бы его у запущенного
+    сайта.
+    """
+    with tempfile.TemporaryDirectory(prefix='yatube_benchmark_') as path:
+        default = {
+            **settings.CACHES['default'],
+            'LOCATION': os.path.join(path, 'cache.sqlite3'),
+        }
+        with override_settings(CACHES={**settings.CACHES, 'default': default}):
+            yield
+
+
+def run(repeat=20, warmup=2, cold=False, only=None, progress=None):
+    """Замеряет страницы; результат — словарь, пригодный для JSON."""
+    if cold:
+        with private_cache():
+            return _run(repeat, warmup, cold, only, progress)
+    return _run(repeat, warmup, cold, only, progress)
+
+
+def _run(repeat, warmup, cold, only, progress):
+    client = Client()
+    reader = get_reader()
+    if reader is not None:
+        client.force_login(reader)
+    results = {}
+    for name, (url, params) in get_targets().items():
+        if only and name not in only:
+            continue
+        results[name] = measure(client, url, params, repeat, warmup, cold)
+        if progress:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'warmup': warmup,
+            'cold_cache': cold,
+            'reader': reader.username if reader else None,
+            'rows': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(old, new):
+    """Относительное изменение p50/p95/p99 и запросов по страницам."""
+    changes = {}
+    for name, current in new['results'].items():
+        previous = old.get('results', {}).get(name)
+        if previous is None:
+            continue
+        changes[name] = {
+            key: round((current[key] - previous[key]) / previous[key] * 100, 1)
+            if previous[key] else None
+            for key in (*(f'p{p}_ms' for p in PERCENTILES), 'max_queries')
+        }
+    return changes
@@ -0,0 +1,251 @@
+"""Поколения (generation) ключей кэша страниц posts.
+
+Кэшированный фрагмент включает в ключ номер поколения своей области
+(вся лента, группа, автор). Сигналы увеличивают поколение при записи,
+и старые фрагменты просто перестают читаться, поэтому фрагменты можно
+хранить долго и при этом не показывать устаревшие данные.
+
+get_or_fill защищает от лавины промахов (dogpile): после сдвига
+поколения или истечения мягкого срока страницу пересчитывает один
+запрос — тот, кто взял короткую блокировку в кэше. Остальные в это
+время получают прежнее значение, а если его нет — недолго ждут
+результат.
+
+С репликами bump на REPLICA_PIN_SECONDS оставляет метку «недавно
+сдвинуто»: реплика может ещё не знать о записи. Запрос, который
+получил поколение с такой меткой, дальше читает основную базу, иначе
+прежние данные с реплики легли бы в кэш под новым поколением.
+Остальные запросы отрисовываются с реплик.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import db_router, metrics
+
+from .models import Group, Post, User
+
+PREFIX = 'posts:generation:'
+RECENT_PREFIX = 'posts:bumped:'
+FILL_PREFIX = 'posts:fill:'
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+# Сколько устаревшее значение живёт после мягкого срока.
+STALE_TIMEOUT = 60 * 10
+# Блокировка пересчёта: дольше самой медленной отрисовки страницы.
+LOCK_TIMEOUT = 10
+# Сколько ждать чужой пересчёт, если отдать нечего.
+LOCK_WAIT = 2
+LOCK_POLL = 0.05
+
+FILLS = metrics.counter(
+    'posts_cache_fill_total',
+    'Обращения get_or_fill по фрагментам: hit, miss, stale, wait.',
+    ('fragment', 'event'),
+)
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follows_scope(author_id):
+    """Подписчики автора: счётчик и кнопка подписки в профиле."""
+    return f'follows:{author_id}'
+
+
+def post_scope(post_id):
+    """Страница поста с комментариями."""
+    return f'post:{post_id}'
+
+
+def post_scopes(post):
+    """Области, на страницах которых выводится пост."""
+    scopes = [
+        index_scope(), author_scope(post.author_id), post_scope(post.pk)
+    ]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def page_tags(match):
+    """Области, от которых зависит страница (core.middleware.page_cache).
+
+    None — объекта страницы нет, кэшировать нечего.
+    """
+    kwargs = match.kwargs
+    if match.view_name == 'posts:index':
+        return [index_scope()]
+    if match.view_name == 'posts:group_list':
+        group_id = Group.objects.filter(slug=kwargs['slug']).values_list(
+            'pk', flat=True
+        ).first()
+        return None if group_id is None else [group_scope(group_id)]
+    if match.view_name == 'posts:profile':
+        author_id = User.objects.filter(
+            username=kwargs['username']
+        ).values_list('pk', flat=True).first()
+        if author_id is None:
+            return None
+        return [author_scope(author_id), follows_scope(author_id)]
+    if match.view_name == 'posts:post_detail':
+        post = Post.objects.filter(pk=kwargs['post_id']).values(
+            'author_id', 'group_id'
+        ).first()
+        if post is None:
+            return None
+        scopes = [post_scope(kwargs['post_id'])]
+        scopes.append(author_scope(post['author_id']))
+        if post['group_id'] is not None:
+            scopes.append(group_scope(post['group_id']))
+        return scopes
+    return []
+
+
+def _initial():
+    # Если ключ поколения вытеснен из кэша, новое поколение берётся
+    # из часов и не совпадает ни с одним из выданных ранее.
+    return int(time.time() * 1000)
+
+
+def get_generations(*scopes):
+    """Текущие поколения областей одним обращением к кэшу.
+
+    Если какая-то область недавно сдвинута, запрос дальше читает
+    основную базу.
+    """
+    keys = {PREFIX + scope: scope for scope in scopes}
+    recent = []
+    if db_router.get_replicas():
+        recent = [RECENT_PREFIX + scope for scope in scopes]
+    found = cache.get_many([*keys, *recent])
+    if any(key in found for key in recent):
+        db_router.read_from_primary()
+    generations = {
+        keys[key]: value for key, value in found.items() if key in keys
+    }
+    for key, scope in keys.items():
+        if scope not in generations:
+            cache.add(key, _initial(), timeout=None)
+            generations[scope] = cache.get(key)
+    return generations
+
+
+def get_generation(scope):
+    return get_generations(scope)[scope]
+
+
+def get_count(scope, queryset, generation=None):
+    """queryset.count() в кэше; пересчитывается в новом поколении scope.
+
+    Поколение сдвигается при создании и удалении постов области. Пока
+    один запрос пересчитывает, остальные получают прежнее значение —
+    для номеров страниц точность до последнего поста не нужна.
+    """
+    if generation is None:
+        generation = get_generation(scope)
+    return get_or_fill(f'count:{scope}', queryset.count, generation)
+
+
+def bump(*scopes):
+    """Начинает новое поколение: старые фрагменты становятся невидимы."""
+    if db_router.get_replicas():
+        # Метка — раньше сдвига: кто увидит новое поколение, увидит и её.
+        cache.set_many(
+            {RECENT_PREFIX + scope: 1 for scope in scopes},
+            timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 15),
+        )
+    for scope in scopes:
+        key = PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), timeout=None)
+
+
+def bump_on_commit(*scopes):
+    """bump для записи в транзакции: сейчас и ещё раз после фиксации.
+
+    Параллельный запрос до фиксации ещё видит прежние данные и может
+    положить их в кэш под новым поколением; второй сдвиг их отбрасывает.
+    """
+    if transaction.get_connection().in_atomic_block:
+        bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def fill_stats():
+    """Счётчики get_or_fill текущего процесса: hit, miss, stale, wait."""
+    stats = Counter()
+    for (_, event), value in FILLS.snapshot():
+        stats[event] += value
+    return dict(stats)
+
+
+def _store(key, fill, generation, timeout):
+    value = fill()
+    cache.set(
+        key, (generation, time.time() + timeout, value),
+        timeout + STALE_TIMEOUT,
+    )
+    return value
+
+
+def _wait(key, generation):
+    """Ждёт значение, которое пересчитывает другой запрос."""
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == generation:
+            return entry
+    return None
+
+
+def get_or_fill(key, fill, generation=None, timeout=FRAGMENT_TIMEOUT,
+                on_stale=None):
+    """Значение key из кэша; при промахе — fill(), но одним запросом.
+
+    Значение свежее timeout секунд и пока поколение совпадает с
+    generation. Устаревшее значение ещё STALE_TIMEOUT секунд отдаётся
+    тем, кто не успел взять блокировку пересчёта; перед этим
+    вызывается on_stale().
+    """
+    fragment = key.split(':', 1)[0]
+    key = FILL_PREFIX + key
+    lock_key = key + ':lock'
+    entry = cache.get(key)
+    if (entry is not None and entry[0] == generation
+            and entry[1] > time.time()):
+        FILLS.inc(fragment=fragment, event='hit')
+        return entry[2]
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        FILLS.inc(fragment=fragment, event='miss')
+        try:
+            return _store(key, fill, generation, timeout)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        FILLS.inc(fragment=fragment, event='stale')
+        if on_stale is not None:
+            on_stale()
+        return entry[2]
+    entry = _wait(key, generation)
+    if entry is not None:
+        FILLS.inc(fragment=fragment, event='wait')
+        return entry[2]
+    # Пересчёт у другого запроса затянулся: считаем сами, не трогая
+    # чужую блокировку.
+    FILLS.inc(fragment=fragment, event='miss')
+    return _store(key, fill, generation, timeout)
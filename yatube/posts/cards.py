@@ -0,0 +1,60 @@
+"""Кэш отрисованных карточек постов (russian doll).
+
+Карточка зависит только от поста и имени автора, поэтому ключ строится
+из id поста, времени его изменения и версии автора. Вся страница
+читает карточки одним get_many и отрисовывает только промахи; адреса
+миниатюр для промахов тоже читаются одним get_many.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics
+
+from . import thumbnails
+from .cache import FRAGMENT_TIMEOUT
+
+DEFAULT_TEMPLATE = 'posts/includes/article.html'
+
+CARDS = metrics.counter(
+    'posts_card_cache_total', 'Карточки постов из кэша и отрисованные.',
+    ('result',),
+)
+
+
+def author_version(author):
+    names = '|'.join((author.username, author.first_name, author.last_name))
+    return hashlib.md5(names.encode()).hexdigest()[:12]
+
+
+def card_key(post, template_name):
+    return 'posts:card:{}:{}:{}:{}'.format(
+        template_name,
+        post.pk,
+        post.updated.timestamp(),
+        author_version(post.author),
+    )
+
+
+def render_cards(posts, template_name=DEFAULT_TEMPLATE):
+    """Пары (пост, html карточки) в порядке posts."""
+    posts = list(posts)
+    keys = [card_key(post, template_name) for post in posts]
+    found = cache.get_many(keys)
+    CARDS.inc(len(found), result='hit')
+    CARDS.inc(len(keys) - len(found), result='miss')
+    thumbnails.prefetch(
+        post for post, key in zip(posts, keys) if key not in found
+    )
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in found:
+            found[key] = render_to_string(template_name, {'post': post})
+            # Карточку с ещё не готовой миниатюрой не кэшируем.
+            if not getattr(post, 'thumbnail_pending', False):
+                missing[key] = found[key]
+    if missing:
+        cache.set_many(missing, FRAGMENT_TIMEOUT)
+    return [(post, mark_safe(found[key])) for post, key in zip(posts, keys)]
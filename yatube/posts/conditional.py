@@ -0,0 +1,135 @@
+"""Условные GET-запросы (ETag / Last-Modified) для страниц posts.
+
+Валидатор страницы считается до запросов самой страницы: для лент это
+поколения областей кэша (posts.cache) — одно обращение к кэшу, для
+страницы поста — одна строка из posts_post. Совпал ETag — отдаём 304
+без отрисовки шаблона.
+
+Страница зависит от пользователя (шапка, кнопка подписки, форма
+комментария с CSRF-токеном), поэтому в ETag входят id пользователя,
+CSRF-куки и полный адрес с параметрами пагинации, а ответ помечается
+как private.
+
+Валидатор лент — поколение, а не сами данные: если поколение недавно
+сдвинуто, get_generations переводит запрос на основную базу, иначе с
+отстающей реплики клиент получил бы прежнее содержимое с новым ETag и
+дальше видел бы его по 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Group, Post
+
+User = get_user_model()
+
+
+def make_etag(request, *parts):
+    """ETag из частей валидатора и всего, что отличает зрителя."""
+    payload = '|'.join(str(part) for part in (
+        request.get_full_path(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *parts,
+    ))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def _generations_etag(request, *scopes):
+    generations = cache.get_generations(*scopes)
+    return make_etag(request, *(generations[scope] for scope in scopes))
+
+
+def index_etag(request):
+    return _generations_etag(request, cache.index_scope())
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return _generations_etag(request, cache.group_scope(group_id))
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return _generations_etag(
+        request, cache.author_scope(author_id), cache.follows_scope(author_id)
+    )
+
+
+def _post_state(request, post_id):
+    """Поля поста для валидаторов; читаются один раз на запрос."""
+    if not hasattr(request, '_post_state'):
+        rows = Post.objects.filter(pk=post_id).annotate(
+            last_comment_id=Max('comments__id'),
+            last_comment_created=Max('comments__created'),
+        ).order_by().values(
+            'author_id', 'group_id', 'updated', 'comments_count',
+            'last_comment_id', 'last_comment_created',
+        )[:1]
+        request._post_state = rows[0] if rows else None
+    return request._post_state
+
+
+def post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    scopes = [cache.author_scope(state['author_id'])]
+    if state['group_id'] is not None:
+        scopes.append(cache.group_scope(state['group_id']))
+    generations = cache.get_generations(*scopes)
+    return make_etag(
+        request,
+        state['updated'].timestamp(),
+        state['comments_count'],
+        state['last_comment_id'],
+        *(generations[scope] for scope in scopes),
+    )
+
+
+def post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return max(filter(None, (
+        state['updated'], state['last_comment_created']
+    )))
+
+
+def conditional_page(etag_func, last_modified_func=None):
+    """condition() с заголовками, которые заставляют клиента перепроверять
+    страницу при каждом показе.
+
+    Страница с устаревшим фрагментом (request.stale_page) уходит без
+    валидаторов: иначе после пересчёта клиент получал бы 304 и так и
+    видел бы прежнюю версию.
+    """
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if getattr(request, 'stale_page', False):
+                del response['ETag']
+                del response['Last-Modified']
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F()-выражения, поэтому конкурентные
+запросы не теряют инкременты. Если строки UserStats ещё нет (например,
+после bulk_create), она создаётся пересчётом из базы при чтении.
+
+Уменьшение не опускает счётчик ниже нуля: разошедшийся счётчик (его
+чинит rebuild_counters) не должен ломать удаление, которое его
+уменьшает.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _count_subquery(model, field, outer='pk'):
+    counts = (
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0
+    )
+
+
+def _recount(user_id):
+    values = {
+        name: model.objects.filter(**{f'{field}_id': user_id}).count()
+        for name, (model, field) in USER_COUNTERS.items()
+    }
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=values
+    )
+    return stats
+
+
+def increment(user_id, name, delta=1):
+    """Атомарно меняет счётчик пользователя на delta."""
+    # Строки может не быть (bulk_create, каскадное удаление автора):
+    # тогда get_stats пересчитает счётчики из базы при первом чтении.
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: Greatest(F(name) + delta, 0)}
+    )
+
+
+def increment_comments(post_id, delta=1):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0)
+    )
+
+
+def get_posts_count(author_ids):
+    """Число постов авторов по счётчикам — без COUNT(*) по постам."""
+    return UserStats.objects.filter(user_id__in=author_ids).aggregate(
+        total=Sum('posts_count')
+    )['total'] or 0
+
+
+def get_stats(user):
+    """Счётчики пользователя без COUNT-запросов в обычном случае."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return _recount(user.pk)
+
+
+def rebuild(dry_run=False):
+    """Сверяет счётчики с базой и исправляет расхождения.
+
+    Возвращает словарь: имя счётчика -> число исправленных строк.
+    """
+    existing = UserStats.objects.values('user_id')
+    missing = User.objects.exclude(pk__in=existing).values_list(
+        'pk', flat=True
+    )
+    report = {'missing_stats': missing.count()}
+    if report['missing_stats'] and not dry_run:
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in missing.iterator()],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    for name, (model, field) in USER_COUNTERS.items():
+        actual = _count_subquery(model, field, outer='user_id')
+        stale = UserStats.objects.annotate(actual=actual).exclude(
+            **{name: F('actual')}
+        )
+        report[name] = stale.count()
+        if report[name] and not dry_run:
+            UserStats.objects.update(**{name: actual})
+    actual = _count_subquery(Comment, 'post')
+    stale = Post.objects.annotate(actual=actual).exclude(
+        comments_count=F('actual')
+    )
+    report['comments_count'] = stale.count()
+    if report['comments_count'] and not dry_run:
+        Post.objects.update(comments_count=actual)
+    return report
@@ -0,0 +1,64 @@
+"""Граф подписок в кэше: множества id авторов, на которых подписан
+пользователь.
+
+Множество читается из кэша, при промахе — одним запросом к Follow.
+Сигналы удаляют ключ при подписке и отписке (и ещё раз после коммита,
+чтобы параллельный запрос не вернул в кэш состояние до транзакции).
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import FRAGMENT_TIMEOUT
+from .models import Follow
+
+PREFIX = 'posts:following:'
+
+
+def _key(user_id):
+    return f'{PREFIX}{user_id}'
+
+
+def get_following_ids_many(user_ids):
+    """{id пользователя: frozenset id авторов} одним get_many."""
+    keys = {_key(user_id): user_id for user_id in user_ids}
+    found = cache.get_many(keys)
+    result = {keys[key]: ids for key, ids in found.items()}
+    missing = [user_id for user_id in keys.values() if user_id not in result]
+    if missing:
+        loaded = {user_id: set() for user_id in missing}
+        rows = Follow.objects.filter(user_id__in=missing).values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in rows:
+            loaded[user_id].add(author_id)
+        loaded = {
+            user_id: frozenset(ids) for user_id, ids in loaded.items()
+        }
+        cache.set_many(
+            {_key(user_id): ids for user_id, ids in loaded.items()},
+            timeout=FRAGMENT_TIMEOUT,
+        )
+        result.update(loaded)
+    return result
+
+
+def get_following_ids(user_id):
+    """На кого подписан пользователь."""
+    return get_following_ids_many([user_id])[user_id]
+
+
+def is_following(user_id, author_id):
+    """Подписан ли user_id на author_id."""
+    return author_id in get_following_ids(user_id)
+
+
+def following_many(user_id, author_ids):
+    """{id автора: подписан ли} для целой страницы авторов сразу."""
+    ids = get_following_ids(user_id)
+    return {author_id: author_id in ids for author_id in author_ids}
+
+
+def invalidate(user_id):
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
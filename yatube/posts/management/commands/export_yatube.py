@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON (по записи на строку) потоково, без загрузки в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл выгрузки; «-» — стандартный вывод. '
+                 'Для *.gz включается сжатие gzip.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать выгрузку gzip при любом имени файла.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=transfer.BATCH_SIZE,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        progress = transfer.Progress(self.stderr.write)
+        if options['path'] == '-':
+            stream = sys.stdout
+        else:
+            stream = transfer.open_output(options['path'], options['gzip'])
+        try:
+            transfer.export(stream, options['chunk_size'], progress)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        progress.report()
+        self.stderr.write(self.style.SUCCESS('Выгрузка завершена.'))
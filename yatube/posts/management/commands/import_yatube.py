@@ -0,0 +1,43 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_yatube (NDJSON, можно gzip) пачками '
+        'bulk_create. Пользователи и группы с теми же username и slug '
+        'не создаются заново; посты и комментарии всегда добавляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл выгрузки; «-» — стандартный ввод.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=transfer.BATCH_SIZE,
+            help='Сколько записей вставлять одним bulk_create.',
+        )
+
+    def handle(self, *args, **options):
+        progress = transfer.Progress(self.stdout.write)
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            stream = transfer.open_input(options['path'])
+        try:
+            with stream:
+                report = transfer.load(
+                    stream, options['batch_size'], progress
+                )
+        except transfer.TransferError as error:
+            raise CommandError(error)
+        progress.report()
+        for name, count in report.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def _generate(name):
+    try:
+        thumbnails.generate(name)
+    except Exception as error:
+        return name, str(error)
+    return name, None
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для картинок всех постов параллельно.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Число процессов (1 — без пула, в текущем процессе).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=16,
+            help='Сколько картинок отдавать процессу за раз.',
+        )
+
+    def handle(self, *args, **options):
+        # Список целиком, а не iterator(): executor.map начинает читать
+        # имена ещё до fork, и дети унаследовали бы открытый курсор.
+        names = list(
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        start = time.monotonic()
+        if options['workers'] > 1:
+            # Дочерние процессы не должны делить соединения с родителем.
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=connections.close_all,
+            )
+            with executor:
+                results = executor.map(
+                    _generate, names, chunksize=options['chunk_size']
+                )
+                done, failed = self.report(results)
+        else:
+            done, failed = self.report(map(_generate, names))
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done} миниатюр, ошибок: {failed}, {elapsed:.1f} с.'
+        ))
+
+    def report(self, results):
+        done = failed = 0
+        for name, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                done += 1
+            if (done + failed) % 100 == 0:
+                self.stdout.write(f'Обработано: {done + failed}')
+        return done, failed
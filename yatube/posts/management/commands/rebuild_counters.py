@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с базой и исправляет их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        report = counters.rebuild(dry_run=dry_run)
+        for name, stale in report.items():
+            self.stdout.write(f'{name}: {stale}')
+        if dry_run:
+            self.stdout.write('Режим проверки: изменения не сохранены.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает триггеры полнотекстового индекса и заново '
+        'индексирует посты и комментарии.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                'Полнотекстовый поиск работает только на SQLite.'
+            )
+        search.install()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Обходит страницы posts тестовым клиентом и сохраняет p50/p95/p99 '
+        'задержки, число запросов и пиковую память в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help=(
+                'Очищать кэш перед каждым запросом; замер идёт на '
+                'временном кэше, общий кэш сайта не трогается.'
+            ),
+        )
+        parser.add_argument(
+            '--only', nargs='+', metavar='NAME',
+            help='Замерить только эти страницы (index, profile, ...).',
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='Куда сохранить результаты в JSON.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Прошлый JSON: показать изменение в процентах.',
+        )
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as stream:
+                    previous = json.load(stream)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Не удалось прочитать прошлый замер: '
+                                   f'{error}')
+        report = benchmark.run(
+            repeat=options['repeat'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            only=options['only'],
+            progress=self.write_result,
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Сохранено в {options["output"]}')
+        if previous is not None:
+            changes = benchmark.compare(previous, report)
+            for name, change in changes.items():
+                self.stdout.write(name + ': ' + ', '.join(
+                    f'{key} {value:+.1f}%' if value is not None
+                    else f'{key} —'
+                    for key, value in change.items()
+                ))
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f'{name:<16} {result["status"]} '
+            f'p50 {result["p50_ms"]:.1f} ms  p95 {result["p95_ms"]:.1f} ms  '
+            f'p99 {result["p99_ms"]:.1f} ms  '
+            f'запросов {result["max_queries"]}  '
+            f'память {result["peak_kb"]:.0f} КБ'
+        )
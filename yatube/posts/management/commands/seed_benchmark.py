@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический набор данных для замеров: пользователей, '
+        'группы, посты со степенным распределением авторов, комментарии '
+        'и граф подписок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows',
+            type=float,
+            default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.2,
+            help='Параметр распределения Парето: чем меньше, тем сильнее '
+                 'посты и подписчики сосредоточены у немногих авторов.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных.',
+        )
+
+    def handle(self, *args, **options):
+        progress = transfer.Progress(self.stdout.write)
+        created = benchmark.seed(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+            progress=progress,
+        )
+        progress.report()
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: ' + ', '.join(
+                f'{name} {count}' for name, count in created.items()
+            )
+        ))
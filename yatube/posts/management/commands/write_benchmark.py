@@ -0,0 +1,186 @@
+import json
+import multiprocessing
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from core.db import is_locked_error
+from posts.benchmark import percentile
+from posts.models import Post, User
+
+PREFIX = 'write_bench_'
+# Настройки SQLite и Django по умолчанию: журнал отката, BEGIN DEFERRED,
+# без повторов.
+BASELINE_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+
+
+def _apply_mode(baseline):
+    settings.QUERY_BUDGET_ENABLED = False
+    if baseline:
+        settings.SQLITE_PRAGMAS = BASELINE_PRAGMAS
+        settings.SQLITE_TRANSACTION_MODE = 'DEFERRED'
+        settings.WRITE_RETRY_ATTEMPTS = 1
+
+
+def _setup_worker(baseline):
+    connections.close_all()
+    _apply_mode(baseline)
+
+
+def _worker(args):
+    """Один процесс: requests пишущих запросов по кругу."""
+    index, requests, post_id = args
+    user = User.objects.get(username=f'{PREFIX}{index}')
+    target = User.objects.get(username=f'{PREFIX}target')
+    client = Client()
+    client.force_login(user)
+    actions = (
+        ('post_create', reverse('posts:post_create'), {'text': 'Пост'}),
+        (
+            'add_comment',
+            reverse('posts:add_comment', kwargs={'post_id': post_id}),
+            {'text': 'Комментарий'},
+        ),
+        (
+            'profile_follow',
+            reverse('posts:profile_follow', kwargs={'username': target}),
+            None,
+        ),
+        (
+            'profile_unfollow',
+            reverse('posts:profile_unfollow', kwargs={'username': target}),
+            None,
+        ),
+    )
+    results = []
+    for num in range(requests):
+        name, url, data = actions[num % len(actions)]
+        start = time.perf_counter()
+        try:
+            if data is None:
+                response = client.get(url)
+            else:
+                response = client.post(url, data)
+            outcome = 'error' if response.status_code >= 500 else 'ok'
+        except OperationalError as error:
+            outcome = 'locked' if is_locked_error(error) else 'error'
+        results.append((name, outcome, time.perf_counter() - start))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает пишущие страницы posts из нескольких процессов и '
+        'считает пропускную способность и долю ошибок «database is '
+        'locked». --baseline — без WAL, BEGIN IMMEDIATE и повторов записи, '
+        'для сравнения. Создаёт пользователей write_bench_* и удаляет их '
+        'вместе с постами в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Запросов на процесс.',
+        )
+        parser.add_argument(
+            '--baseline',
+            action='store_true',
+            help='Журнал отката, BEGIN DEFERRED, без повторов записи.',
+        )
+        parser.add_argument('--output', '-o', help='Сохранить итог в JSON.')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не удалять созданные данные.',
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        baseline = options['baseline']
+        post_id = self.prepare(processes)
+        self.set_journal_mode(baseline)
+        tasks = [
+            (index, options['requests'], post_id)
+            for index in range(processes)
+        ]
+        start = time.perf_counter()
+        if processes > 1:
+            # Дочерние процессы открывают свои соединения с базой.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(
+                processes, initializer=_setup_worker, initargs=(baseline,)
+            ) as pool:
+                batches = pool.map(_worker, tasks)
+        else:
+            _apply_mode(baseline)
+            batches = [_worker(task) for task in tasks]
+        elapsed = time.perf_counter() - start
+        report = self.report(
+            [row for batch in batches for row in batch], elapsed, options
+        )
+        if not options['keep']:
+            User.objects.filter(username__startswith=PREFIX).delete()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+    def prepare(self, processes):
+        for index in [*range(processes), 'target']:
+            User.objects.get_or_create(username=f'{PREFIX}{index}')
+        author = User.objects.get(username=f'{PREFIX}target')
+        post, _ = Post.objects.get_or_create(
+            author=author, text='Пост для комментариев'
+        )
+        return post.pk
+
+    def set_journal_mode(self, baseline):
+        if connection.vendor != 'sqlite':
+            return
+        pragmas = BASELINE_PRAGMAS if baseline else settings.SQLITE_PRAGMAS
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'PRAGMA journal_mode = {pragmas["journal_mode"]}'
+            )
+
+    def report(self, rows, elapsed, options):
+        outcomes = Counter(outcome for _, outcome, _ in rows)
+        total = len(rows)
+        report = {
+            'mode': 'baseline' if options['baseline'] else 'hardened',
+            'processes': options['processes'],
+            'requests': total,
+            'seconds': round(elapsed, 3),
+            'throughput': round(total / elapsed, 1),
+            'locked': outcomes['locked'],
+            'errors': outcomes['error'],
+            'locked_rate': round(outcomes['locked'] / total, 4),
+            'latency_ms': {},
+        }
+        for name in sorted({name for name, _, _ in rows}):
+            timings = [
+                seconds * 1000 for action, _, seconds in rows
+                if action == name
+            ]
+            report['latency_ms'][name] = {
+                'p50': round(percentile(timings, 50), 2),
+                'p95': round(percentile(timings, 95), 2),
+            }
+        self.stdout.write(
+            f'{report["mode"]}: {total} запросов за {elapsed:.1f} с, '
+            f'{report["throughput"]} запросов/с, '
+            f'«database is locked»: {report["locked"]} '
+            f'({report["locked_rate"]:.1%}), других ошибок: '
+            f'{report["errors"]}'
+        )
+        for name, latency in report['latency_ms'].items():
+            self.stdout.write(
+                f'  {name:<18} p50 {latency["p50"]} ms  '
+                f'p95 {latency["p95"]} ms'
+            )
+        return report
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='group',
+            options={'verbose_name': 'Группа', 'verbose_name_plural': 'Группы'},
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='description',
+            field=models.TextField(verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='title',
+            field=models.CharField(max_length=200, verbose_name='Название'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_following'),
+        ),
+    ]
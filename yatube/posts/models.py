@@ -22,11 +22,13 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField('Текст', help_text='Текст нового поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -35,6 +37,7 @@ class Post(models.Model):
         on_delete=SET_NULL,
         related_name='posts',
         verbose_name='Группа',
+        db_index=False,
         help_text='Группа, к которой будет относиться пост'
     )
     image = models.ImageField(
@@ -43,15 +46,42 @@ class Post(models.Model):
         blank=True,
         help_text='Загрузите картинку'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа при загрузке: при смене группы сбрасываются кэши обеих.
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
 
 class Comment(models.Model):
     text = models.TextField('Текст', help_text='Комментарий')
@@ -59,7 +89,8 @@ class Comment(models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -68,20 +99,29 @@ class Comment(models.Model):
     )
 
     class Meta:
+        ordering = ['created', 'id']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='follower'
+        related_name='follower',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
@@ -91,3 +131,70 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx'
+            )
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Поддерживаются сигналами (posts/signals.py) и сверяются командой
+    rebuild_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
@@ -0,0 +1,275 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Таблица posts_search хранит тексты постов (rowid = 2 * id) и
+комментариев (rowid = 2 * id + 1) вместе с post_id. Её поддерживают
+триггеры на posts_post и posts_comment, поэтому индекс не расходится
+с данными даже при queryset.update() и bulk_create.
+
+Перестройка таблицы в миграциях SQLite (AlterField и т. п.) удаляет
+триггеры. После каждого migrate обработчик post_migrate (ensure_installed)
+создаёт недостающие триггеры и перезаполняет индекс.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db import connection as default_connection
+from django.utils.functional import cached_property
+
+from .models import Post
+from .utils import NEXT, PREVIOUS, CursorPaginator, encode_cursor
+
+TABLE = 'posts_search'
+
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        text,
+        post_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+
+# (имя, таблица, выражение rowid для строки, выражение post_id)
+SOURCES = (
+    ('post', 'posts_post', '{row}.id * 2', '{row}.id'),
+    ('comment', 'posts_comment', '{row}.id * 2 + 1', '{row}.post_id'),
+)
+
+
+def _trigger_sql(name, table, rowid, post_id):
+    insert = (
+        f'INSERT INTO {TABLE} (rowid, text, post_id) VALUES '
+        f'({rowid.format(row="new")}, new.text, {post_id.format(row="new")});'
+    )
+    delete = f'DELETE FROM {TABLE} WHERE rowid = {rowid.format(row="old")};'
+    prefix = f'CREATE TRIGGER IF NOT EXISTS {TABLE}_{name}'
+    return [
+        f'{prefix}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+        f'{prefix}_update AFTER UPDATE OF text ON {table} '
+        f'BEGIN {delete} {insert} END',
+        f'{prefix}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+    ]
+
+
+def _reindex_sql():
+    statements = [f'DELETE FROM {TABLE}']
+    for _, table, rowid, post_id in SOURCES:
+        statements.append(
+            f'INSERT INTO {TABLE} (rowid, text, post_id) '
+            f'SELECT {rowid.format(row=table)}, text, '
+            f'{post_id.format(row=table)} FROM {table}'
+        )
+    return statements
+
+
+def is_available(connection=default_connection):
+    return connection.vendor == 'sqlite'
+
+
+def install(connection=default_connection):
+    """Создаёт индекс и триггеры, если их нет, и заполняет индекс."""
+    if not is_available(connection):
+        return
+    statements = [CREATE_TABLE]
+    for source in SOURCES:
+        statements.extend(_trigger_sql(*source))
+    statements.extend(_reindex_sql())
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def _trigger_names():
+    return [
+        f'{TABLE}_{name}_{event}'
+        for name, *_ in SOURCES
+        for event in ('insert', 'update', 'delete')
+    ]
+
+
+def ensure_installed(sender=None, using=None, **kwargs):
+    """post_migrate: восстанавливает триггеры, удалённые миграцией.
+
+    Пока триггеров не было, изменения не попадали в индекс, поэтому
+    он заполняется заново. Если таблицы индекса нет (миграция индекса
+    не применена), ничего не делает.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if not is_available(connection):
+        return
+    names = [TABLE, *_trigger_names()]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN ({})'.format(
+                ', '.join(['%s'] * len(names))
+            ),
+            names,
+        )
+        existing = {name for name, in cursor.fetchall()}
+    if TABLE in existing and len(existing) < len(names):
+        install(connection)
+
+
+def uninstall(connection=default_connection):
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        for name in _trigger_names():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+TOKEN = re.compile(r'(\w+)(\*?)')
+
+
+def parse_query(query):
+    """Запрос пользователя -> выражение FTS5 или None.
+
+    Слова объединяются по И; «слово*» ищет по префиксу. Служебный
+    синтаксис FTS5 из ввода не пропускается.
+    """
+    terms = [
+        '"{}"{}'.format(word, '*' if star else '')
+        for word, star in TOKEN.findall(query or '')
+    ]
+    return ' '.join(terms) or None
+
+
+def match_post_ids_sql(expression, posts_only=False):
+    """Подзапрос id постов, подходящих под выражение FTS5."""
+    sql = f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s'
+    if posts_only:
+        sql += ' AND (rowid & 1) = 0'
+    return sql, [expression]
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация результатов поиска по (релевантность, rowid).
+
+    Релевантность поста — лучший bm25 среди поста и его комментариев
+    (чем меньше, тем выше в выдаче). Строки индекса выбираются
+    по (rank, rowid) с LIMIT — SQLite держит только верхние N строк и
+    не группирует все совпадения; пост выводится на месте своей лучшей
+    строки, остальные его строки пропускаются.
+    """
+
+    def __init__(self, expression, per_page):
+        self.expression = expression
+        self.per_page = int(per_page)
+
+    @staticmethod
+    def _clean_key(key):
+        score, rowid = key
+        if isinstance(score, (int, float)) and isinstance(rowid, int):
+            return key
+        return None
+
+    @cached_property
+    def count(self):
+        sql = (
+            f'SELECT COUNT(DISTINCT post_id) FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s'
+        )
+        with default_connection.cursor() as cursor:
+            cursor.execute(sql, [self.expression])
+            return cursor.fetchone()[0]
+
+    def _matches(self, key, forward, limit):
+        """Строки (rowid, post_id, rank) по порядку выдачи после key."""
+        where, params = '', [self.expression]
+        sign = '>' if forward else '<'
+        if key is not None:
+            where = (
+                f'AND (rank {sign} %s OR (rank = %s AND rowid {sign} %s)) '
+            )
+            params += [key[0], key[0], key[1]]
+        order = '' if forward else ' DESC'
+        sql = (
+            f'SELECT rowid, post_id, rank FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s {where}'
+            f'ORDER BY rank{order}, rowid{order} LIMIT %s'
+        )
+        params.append(limit)
+        with default_connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _best_rowids(self, post_ids):
+        """rowid лучшей строки каждого из постов post_ids."""
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        sql = (
+            f'SELECT rowid, post_id, rank FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s AND post_id IN ({placeholders})'
+        )
+        with default_connection.cursor() as cursor:
+            cursor.execute(sql, [self.expression, *post_ids])
+            rows = sorted(cursor.fetchall(), key=lambda row: (row[2], row[0]))
+        best = {}
+        for rowid, post_id, _ in rows:
+            best.setdefault(post_id, rowid)
+        return best
+
+    def _rows(self, key, forward):
+        """До per_page + 1 пар (post_id, ключ) — по строке на пост."""
+        limit = (self.per_page + 1) * 2
+        rows, seen, start = [], set(), key
+        while len(rows) <= self.per_page:
+            batch = self._matches(start, forward, limit)
+            if not batch:
+                break
+            if key is None and forward:
+                # Выдача с начала: первая строка поста — его лучшая.
+                best = {}
+                for rowid, post_id, _ in batch:
+                    if post_id not in seen:
+                        seen.add(post_id)
+                        best[post_id] = rowid
+            else:
+                best = self._best_rowids(
+                    sorted({post_id for _, post_id, _ in batch})
+                )
+            rows.extend(
+                (post_id, (score, rowid))
+                for rowid, post_id, score in batch
+                if best.get(post_id) == rowid
+            )
+            if len(batch) < limit:
+                break
+            start = (batch[-1][2], batch[-1][0])
+        return rows[:self.per_page + 1]
+
+    def fetch_page(self, direction, key):
+        forward = direction == NEXT
+        rows = self._rows(key, forward)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in rows]
+        )
+        next_cursor = previous_cursor = ''
+        if rows and (has_more if forward else True):
+            next_cursor = encode_cursor(NEXT, rows[-1][1])
+        if rows and (key is not None if forward else has_more):
+            previous_cursor = encode_cursor(PREVIOUS, rows[0][1])
+        return (
+            [posts[post_id] for post_id, _ in rows if post_id in posts],
+            next_cursor,
+            previous_cursor,
+        )
+
+
+def get_page_obj(request, posts_count):
+    """Страница результатов поиска по ?q= или None для пустого запроса."""
+    expression = parse_query(request.GET.get('q'))
+    if expression is None:
+        return None
+    if not is_available():
+        posts = Post.objects.select_related('author', 'group').filter(
+            text__icontains=request.GET['q']
+        )
+        paginator = CursorPaginator(posts, posts_count)
+    else:
+        paginator = SearchPaginator(expression, posts_count)
+    return paginator.get_page(request.GET.get('cursor'))
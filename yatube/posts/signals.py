@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache, counters, follow_graph, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def bump_post_scopes(post):
+    scopes = cache.post_scopes(post)
+    old_group_id = getattr(post, '_loaded_group_id', None)
+    if old_group_id not in (None, post.group_id):
+        scopes.append(cache.group_scope(old_group_id))
+    cache.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif update_fields != frozenset({'last_login'}):
+        # Имя автора выводится в карточках постов на всех лентах,
+        # в том числе в группах, где он публиковался.
+        group_ids = instance.posts.exclude(group=None).values_list(
+            'group_id', flat=True
+        )
+        cache.bump_on_commit(
+            cache.index_scope(),
+            cache.author_scope(instance.pk),
+            *(cache.group_scope(pk) for pk in group_ids.distinct())
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.author_id, 'posts_count')
+        timeline.fan_out(instance)
+    bump_post_scopes(instance)
+    instance._loaded_group_id = instance.group_id
+    if instance.image and instance.image.name != getattr(
+        instance, '_loaded_image', None
+    ):
+        thumbnails.schedule(instance)
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.increment(instance.author_id, 'posts_count', -1)
+    bump_post_scopes(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Название группы выводится и в профилях авторов её постов.
+    author_ids = instance.posts.values_list('author_id', flat=True)
+    cache.bump_on_commit(
+        cache.index_scope(),
+        cache.group_scope(instance.pk),
+        *(cache.author_scope(pk) for pk in author_ids.distinct())
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.increment_comments(instance.post_id)
+    cache.bump_on_commit(cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.increment_comments(instance.post_id, -1)
+    cache.bump_on_commit(cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.author_id, 'followers_count')
+        counters.increment(instance.user_id, 'following_count')
+        timeline.backfill(instance.user_id, instance.author_id)
+        cache.bump_on_commit(cache.follows_scope(instance.author_id))
+        follow_graph.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.increment(instance.author_id, 'followers_count', -1)
+    counters.increment(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    cache.bump_on_commit(cache.follows_scope(instance.author_id))
+    follow_graph.invalidate(instance.user_id)
+    followers = UserStats.objects.filter(
+        user_id=instance.author_id
+    ).values_list('followers_count', flat=True).first()
+    if followers == timeline.get_fanout_limit():
+        timeline.demote(instance.author_id)
@@ -0,0 +1,70 @@
+import hashlib
+
+from django import template
+from django.template import TemplateSyntaxError
+
+from posts.cache import get_or_fill
+
+register = template.Library()
+
+
+class PageCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, generation, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.generation = generation
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        try:
+            timeout = int(timeout)
+        except (TypeError, ValueError):
+            raise TemplateSyntaxError(
+                f'page_cache: срок {timeout!r} не является числом.'
+            )
+        vary = '|'.join(str(var.resolve(context)) for var in self.vary_on)
+        key = '{}:{}'.format(
+            self.name, hashlib.md5(vary.encode()).hexdigest()
+        )
+        request = context.get('request')
+
+        def on_stale():
+            # Страницу с устаревшим фрагментом нельзя класть в кэш
+            # целых страниц под новыми поколениями и отдавать с ETag
+            # нового поколения (posts.conditional).
+            if request is not None:
+                request.no_page_cache = True
+                request.stale_page = True
+
+        return get_or_fill(
+            key,
+            lambda: self.nodelist.render(context),
+            self.generation.resolve(context),
+            timeout,
+            on_stale,
+        )
+
+
+@register.tag('page_cache')
+def do_page_cache(parser, token):
+    """{% page_cache срок имя поколение [ключи...] %} ... {% endpage_cache %}
+
+    Как {% cache %}, но через posts.cache.get_or_fill: фрагмент
+    пересчитывает один запрос, остальные получают прежнюю версию.
+    """
+    nodelist = parser.parse(('endpage_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 4:
+        raise TemplateSyntaxError(
+            f'{tokens[0]} ожидает срок, имя фрагмента и поколение.'
+        )
+    return PageCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        parser.compile_filter(tokens[3]),
+        [parser.compile_filter(token) for token in tokens[4:]],
+    )
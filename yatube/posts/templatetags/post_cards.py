@@ -0,0 +1,11 @@
+from django import template
+
+from posts.cards import DEFAULT_TEMPLATE, render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, template_name=DEFAULT_TEMPLATE):
+    """{% post_cards page_obj as cards %} — карточки страницы из кэша."""
+    return render_cards(posts, template_name)
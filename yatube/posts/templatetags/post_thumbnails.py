@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    """{% post_thumbnail post as url %} — адрес миниатюры без генерации."""
+    return thumbnails.get_url(post)
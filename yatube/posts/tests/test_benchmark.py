@@ -0,0 +1,72 @@
+# posts/tests/test_benchmark.py
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import (
+    Comment, Follow, Post, TimelineEntry, User, UserStats,
+)
+
+
+class BenchmarkTests(TestCase):
+    """Команды seed_benchmark и run_benchmark."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        call_command(
+            'seed_benchmark', users=20, posts=200, groups=3, comments=50,
+            follows=3, seed=1, stdout=StringIO(),
+        )
+
+    def test_seed(self):
+        """Данные созданы вместе со счётчиками и лентами."""
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 200
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_seed_after_delete(self):
+        """Удалённые последние строки не ломают повторное заполнение."""
+        User.objects.order_by('-pk').first().delete()
+        call_command(
+            'seed_benchmark', users=5, posts=20, groups=1, comments=5,
+            follows=2, seed=2, stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.filter(
+            author__username__startswith='bench_'
+        ).count(), Post.objects.count())
+
+    def test_cold_keeps_shared_cache(self):
+        """--cold очищает свой временный кэш, а не общий."""
+        cache.set('benchmark:test', 1)
+        call_command(
+            'run_benchmark', repeat=1, warmup=0, cold=True, only=['index'],
+            stdout=StringIO(),
+        )
+        self.assertEqual(cache.get('benchmark:test'), 1)
+
+    def test_run(self):
+        """Результаты замера сохраняются в JSON."""
+        path = os.path.join(self.tmp_dir, 'result.json')
+        call_command(
+            'run_benchmark', repeat=2, warmup=0, output=path,
+            stdout=StringIO(),
+        )
+        with open(path, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(report['meta']['rows']['posts'], 200)
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertEqual(result['status'], 200)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['max_queries'], 0)
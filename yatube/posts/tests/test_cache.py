@@ -0,0 +1,105 @@
+# posts/tests/test_cache.py
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import cache as posts_cache
+from posts.models import Post, User
+
+
+class GetOrFillTests(TestCase):
+    """Пересчёт фрагмента одним запросом (single flight)."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def fill(self, value='новое'):
+        def fill():
+            self.calls.append(value)
+            return value
+        return fill
+
+    def get(self, generation=1, value='новое'):
+        return posts_cache.get_or_fill(
+            'test', self.fill(value), generation, timeout=60
+        )
+
+    def hold_lock(self):
+        cache.add(posts_cache.FILL_PREFIX + 'test:lock', 1)
+
+    def test_filled_once(self):
+        """Второе обращение — попадание без пересчёта."""
+        before = posts_cache.fill_stats()
+        self.assertEqual(self.get(), 'новое')
+        self.assertEqual(self.get(value='другое'), 'новое')
+        self.assertEqual(self.calls, ['новое'])
+        after = posts_cache.fill_stats()
+        self.assertEqual(after['hit'] - before.get('hit', 0), 1)
+        self.assertEqual(after['miss'] - before.get('miss', 0), 1)
+
+    def test_new_generation_refilled(self):
+        self.get()
+        self.assertEqual(self.get(generation=2, value='другое'), 'другое')
+        self.assertEqual(self.get(generation=2), 'другое')
+
+    def test_stale_while_locked(self):
+        """Пока пересчёт идёт в другом запросе, отдаётся прежнее значение."""
+        self.get()
+        self.hold_lock()
+        self.assertEqual(self.get(generation=2, value='другое'), 'новое')
+        self.assertEqual(self.calls, ['новое'])
+        cache.delete(posts_cache.FILL_PREFIX + 'test:lock')
+        self.assertEqual(self.get(generation=2, value='другое'), 'другое')
+
+    def test_soft_timeout(self):
+        self.get()
+        with mock.patch('posts.cache.time.time', return_value=2 ** 40):
+            self.assertEqual(self.get(value='другое'), 'другое')
+
+    @mock.patch('posts.cache.LOCK_WAIT', 0.1)
+    def test_fill_after_wait(self):
+        """Без прежнего значения и без результата чужого пересчёта —
+        считает сам."""
+        self.hold_lock()
+        self.assertEqual(self.get(), 'новое')
+        self.assertEqual(self.calls, ['новое'])
+
+
+class BumpOnCommitTests(TestCase):
+    """Сигналы сдвигают поколение ещё раз после фиксации транзакции."""
+
+    def test_post_bumped_after_commit(self):
+        user = User.objects.create_user(username='author')
+        generation = posts_cache.get_generations(posts_cache.index_scope())
+        with mock.patch('posts.cache.transaction.on_commit') as on_commit:
+            Post.objects.create(text='Текст', author=user)
+        before_commit = posts_cache.get_generations(posts_cache.index_scope())
+        self.assertNotEqual(before_commit, generation)
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertNotEqual(
+            posts_cache.get_generations(posts_cache.index_scope()),
+            before_commit,
+        )
+
+
+class PageCacheTagTests(TestCase):
+    """Фрагменты лент кэшируются через get_or_fill."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user')
+        Post.objects.create(author=self.user, text='Первый пост')
+
+    def test_stale_page_during_refill(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='Второй пост')
+        with mock.patch('posts.cache.cache.add', return_value=False):
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Второй пост')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(self.client.get(url), 'Второй пост')
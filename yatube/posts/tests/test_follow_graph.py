@@ -0,0 +1,64 @@
+# posts/tests/test_follow_graph.py
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    """Множества подписок в кэше."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.authors = [
+            User.objects.create_user(username=f'author_{num}')
+            for num in range(3)
+        ]
+        Follow.objects.create(user=self.user, author=self.authors[0])
+
+    def test_cached_after_first_read(self):
+        """Повторные проверки не обращаются к базе."""
+        with self.assertNumQueries(1):
+            follow_graph.get_following_ids(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.user.pk, self.authors[0].pk)
+            )
+            self.assertEqual(
+                follow_graph.following_many(
+                    self.user.pk, [author.pk for author in self.authors]
+                ),
+                {
+                    self.authors[0].pk: True,
+                    self.authors[1].pk: False,
+                    self.authors[2].pk: False,
+                },
+            )
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка через страницы сразу видны в графе."""
+        follow_graph.get_following_ids(self.user.pk)
+        self.client.force_login(self.user)
+        author = self.authors[1]
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': author})
+        )
+        self.assertTrue(follow_graph.is_following(self.user.pk, author.pk))
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': author})
+        )
+        self.assertFalse(follow_graph.is_following(self.user.pk, author.pk))
+
+    def test_many_users_one_query(self):
+        """Множества нескольких пользователей читаются одним запросом."""
+        Follow.objects.create(user=self.authors[1], author=self.authors[2])
+        with self.assertNumQueries(1):
+            following = follow_graph.get_following_ids_many(
+                [self.user.pk, self.authors[1].pk, self.authors[2].pk]
+            )
+        self.assertEqual(following[self.user.pk], {self.authors[0].pk})
+        self.assertEqual(following[self.authors[1].pk], {self.authors[2].pk})
+        self.assertEqual(following[self.authors[2].pk], frozenset())
@@ -1,7 +1,10 @@
 # posts/tests/test_models.py
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 
 class PostModelTest(TestCase):
@@ -60,3 +63,58 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value
                 )
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_drifted_counters_do_not_break_deletes(self):
+        """Удаление при разошедшемся счётчике оставляет его нулём."""
+        Post.objects.bulk_create([Post(author=self.author, text='Пост')])
+        post = Post.objects.get(text='Пост')
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.user, text='Комментарий')]
+        )
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters исправляет расхождения."""
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
@@ -0,0 +1,81 @@
+# posts/tests/test_query_budget.py
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True)
+class QueryBudgetViewsTests(TestCase):
+    """Представления posts укладываются в объявленные бюджеты запросов.
+
+    Превышение бюджета или N+1 поднимает QueryBudgetExceeded
+    из QueryBudgetMiddleware, и тест падает.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth_user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text='Тестовый пост № %s' % num,
+            )
+        cls.own_post = Post.objects.create(author=cls.user, text='Свой пост')
+        for num in range(12):
+            commentator = User.objects.create_user(username='user%s' % num)
+            Comment.objects.create(
+                post=cls.post, author=commentator, text='Комментарий'
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_read_views(self):
+        """Страницы чтения для гостя и авторизованного пользователя."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for client in (self.client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    client.get(url)
+        self.authorized_client.get(reverse('posts:follow_index'))
+
+    def test_write_views(self):
+        """Страницы и действия записи."""
+        post_id = self.own_post.id
+        self.authorized_client.get(reverse('posts:post_create'))
+        self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.authorized_client.get(
+            reverse('posts:post_edit', kwargs={'post_id': post_id})
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post_id}),
+            {'text': 'Исправленный пост'}
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post_id}),
+            {'text': 'Комментарий'}
+        )
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
@@ -0,0 +1,112 @@
+# posts/tests/test_query_plans.py
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц posts не читают таблицы целиком и не сортируют."""
+
+    POSTS_COUNT = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth_user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(cls.POSTS_COUNT):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text='Тестовый пост № %s' % num,
+            )
+        for num in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='Комментарий %s' % num
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:comments', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+
+    def assert_plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url, params)
+        sql_list = [
+            query['sql'] for query in queries
+            if '"posts_' in query['sql'] and query['sql'].startswith('SELECT')
+        ]
+        self.assertTrue(sql_list)
+        with connection.cursor() as cursor:
+            for sql in sql_list:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    with self.subTest(url=url, sql=sql, plan=detail):
+                        self.assertNotIn('TEMP B-TREE', detail)
+                        self.assertFalse(
+                            detail.startswith('SCAN')
+                            and 'USING' not in detail
+                        )
+        return response
+
+    def test_first_pages(self):
+        """Первые страницы списков и страница поста."""
+        for url in self.get_urls():
+            self.assert_plans(url)
+
+    def test_cursor_pages(self):
+        """Страницы по курсору."""
+        for url in self.get_urls():
+            response = self.authorized_client.get(url)
+            page_obj = response.context.get('page_obj')
+            if page_obj is None:
+                continue
+            self.assert_plans(url, {'cursor': page_obj.next_cursor})
+
+    def test_legacy_pages(self):
+        """Старые ссылки ?page=N."""
+        for url in self.get_urls():
+            self.assert_plans(url, {'page': 2})
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0, QUERY_BUDGET_RAISE=True)
+    def test_follow_index_with_celebrities(self):
+        """Лента с авторами, посты которых подмешиваются при чтении.
+
+        У каждой «звезды» своя часть с LIMIT по индексу автора, все части
+        читаются одним запросом без сортировки: число запросов не зависит
+        от числа подписок.
+        """
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as single:
+            self.authorized_client.get(url)
+        for num in range(5):
+            author = User.objects.create_user(username='star%s' % num)
+            Follow.objects.create(user=self.user, author=author)
+            Post.objects.create(author=author, text='Пост звезды %s' % num)
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as many:
+            self.authorized_client.get(url)
+        self.assertEqual(len(many), len(single))
+        page_obj = self.assert_plans(url).context['page_obj']
+        self.assert_plans(url, {'cursor': page_obj.next_cursor})
@@ -0,0 +1,127 @@
+# posts/tests/test_search.py
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+
+
+class SearchTests(TestCase):
+    """Полнотекстовый поиск по постам и комментариям."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Поход в горы на выходных'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Рецепт яблочного пирога'
+        )
+        Comment.objects.create(
+            post=cls.other, author=cls.user, text='Возьму с собой в горы'
+        )
+
+    def search(self, query, **params):
+        response = Client().get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_parse_query(self):
+        """Ввод пользователя превращается в безопасное выражение FTS5."""
+        self.assertEqual(search.parse_query('горы пирог*'), '"горы" "пирог"*')
+        self.assertEqual(search.parse_query('NEAR(") OR'), '"NEAR" "OR"')
+        self.assertIsNone(search.parse_query(' *" '))
+
+    def test_post_and_comment_match(self):
+        """Находятся посты по своему тексту и по тексту комментариев."""
+        page_obj = self.search('горы')
+        self.assertCountEqual(page_obj.object_list, [self.post, self.other])
+        self.assertEqual(list(self.search('рецепт')), [self.other])
+
+    def test_prefix(self):
+        """Слово со звёздочкой ищется по префиксу."""
+        self.assertEqual(list(self.search('ябл*')), [self.other])
+        self.assertEqual(list(self.search('ябл')), [])
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при изменении и удалении."""
+        Post.objects.filter(pk=self.post.pk).update(text='Сплав по реке')
+        self.assertEqual(list(self.search('сплав')), [self.post])
+        self.assertEqual(list(self.search('горы')), [self.other])
+        Comment.objects.all().delete()
+        self.assertEqual(list(self.search('горы')), [])
+
+    def test_empty_query(self):
+        """Пустой запрос не выполняет поиск."""
+        self.assertIsNone(self.search(''))
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_cursor_pagination(self):
+        """Результаты листаются курсором без повторов и пропусков."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Вершина номер %s' % num)
+            for num in range(15)
+        )
+        first = self.search('вершина')
+        second = self.search('вершина', cursor=first.next_cursor)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        ids = [post.pk for post in [*first, *second]]
+        self.assertEqual(len(set(ids)), 15)
+        back = self.search('вершина', cursor=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_post_once_across_pages(self):
+        """Пост с подходящими комментариями выводится один раз, на месте
+        лучшей строки, в какую сторону ни листать."""
+        for num in range(8):
+            post = Post.objects.create(
+                author=self.user, text='Озеро номер %s' % num
+            )
+            for _ in range(num % 3):
+                Comment.objects.create(
+                    post=post, author=self.user, text='Озеро озеро'
+                )
+        paginator = search.SearchPaginator(search.parse_query('озеро'), 3)
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        ids = [post.pk for page in pages for post in page]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+        page, back = pages[-1], [list(pages[-1])]
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            back.append(list(page))
+        self.assertEqual(back[::-1], [list(page) for page in pages])
+
+    def test_triggers_restored_after_migrate(self):
+        """post_migrate восстанавливает удалённые триггеры и индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_search_post_update')
+        Post.objects.filter(pk=self.post.pk).update(text='Сплав по реке')
+        self.assertEqual(list(self.search('сплав')), [])
+        search.ensure_installed(using='default')
+        self.assertEqual(list(self.search('сплав')), [self.post])
+        Post.objects.filter(pk=self.post.pk).update(text='Поход в горы')
+        self.assertEqual(list(self.search('сплав')), [])
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по индексу и только по текстам постов."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'горы'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post]
+        )
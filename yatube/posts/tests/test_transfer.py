@@ -0,0 +1,89 @@
+# posts/tests/test_transfer.py
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class TransferTests(TestCase):
+    """Выгрузка export_yatube и загрузка import_yatube."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост'
+        )
+        Post.objects.create(author=self.author, text='Пост без группы')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+
+    def export(self, name):
+        path = os.path.join(self.tmp_dir, name)
+        call_command('export_yatube', path, stderr=StringIO())
+        return path
+
+    def test_export_gzip(self):
+        """Выгрузка *.gz сжата и содержит записи всех моделей."""
+        path = self.export('dump.ndjson.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as stream:
+            lines = stream.read().splitlines()
+        self.assertEqual(len(lines), 1 + 2 + 1 + 2 + 1 + 1)
+        self.assertIn('"format":"yatube"', lines[0])
+
+    def test_round_trip(self):
+        """Загрузка в пустую базу восстанавливает данные и счётчики."""
+        path = self.export('dump.ndjson.gz')
+        pub_date = self.post.pub_date
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command('import_yatube', path, stdout=StringIO())
+        post = Post.objects.get(text='Тестовый пост')
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'test_slug')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        author = User.objects.get(username='author')
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 2)
+        self.assertEqual(author.following.get().user.username, 'reader')
+        self.assertEqual(
+            User.objects.get(username='reader').timeline.count(), 2
+        )
+
+    def test_import_into_existing_data(self):
+        """Существующие пользователи и группы переиспользуются."""
+        path = self.export('dump.ndjson')
+        stdout = StringIO()
+        call_command('import_yatube', path, stdout=stdout)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertIn('post: 2', stdout.getvalue())
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertGreater(new_post.pk, Post.objects.exclude(
+            pk=new_post.pk
+        ).order_by('-pk')[0].pk)
+
+    def test_wrong_file(self):
+        """Чужой файл не загружается."""
+        path = os.path.join(self.tmp_dir, 'wrong.json')
+        with open(path, 'w') as stream:
+            stream.write('{"model": "post"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_yatube', path, stdout=StringIO())
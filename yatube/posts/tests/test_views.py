@@ -1,19 +1,33 @@
 # posts/tests/test_views.py
-from linecache import cache
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
 
-from posts.models import User, Group, Post, Comment, Follow
-from posts.views import POSTS_COUNT
+from posts import cache as cache_scopes, thumbnails, timeline
+from posts.models import User, Group, Post, Comment, Follow, TimelineEntry
+from posts.utils import NEXT, WindowPaginator, encode_cursor
+from posts.views import COMMENTS_COUNT, POSTS_COUNT
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -221,6 +235,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -247,21 +262,359 @@ class PaginatorViewsTest(TestCase):
                     self.TEST_POSTS_COUNT - POSTS_COUNT
                 )
 
+    # Проверка keyset-пагинации по курсорам.
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        for reverse_name in self.templates_pages_names:
+            with self.subTest(reverse_name=reverse_name):
+                first = self.authorized_client.get(reverse_name)
+                first_page = first.context['page_obj']
+                self.assertFalse(first_page.has_previous())
+                second = self.authorized_client.get(
+                    reverse_name, {'cursor': first_page.next_cursor})
+                second_page = second.context['page_obj']
+                self.assertEqual(
+                    len(second_page),
+                    self.TEST_POSTS_COUNT - POSTS_COUNT
+                )
+                self.assertFalse(second_page.has_next())
+                back = self.authorized_client.get(
+                    reverse_name, {'cursor': second_page.previous_cursor})
+                self.assertEqual(
+                    list(back.context['page_obj']), list(first_page)
+                )
+
+    def test_cursor_page_without_count(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse('posts:index'))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+    def test_broken_cursor(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), POSTS_COUNT)
+
+    def test_forged_cursor(self):
+        """Курсор с ключом не той формы или типа открывает первую страницу."""
+        post_id = self.post.pk
+        urls = (
+            (reverse('posts:index'), 'cursor'),
+            (reverse('posts:post_detail', args=(post_id,)), 'comments'),
+            (reverse('posts:comments', args=(post_id,)), 'cursor'),
+            (reverse('api:post_list'), 'cursor'),
+            (reverse('posts:search'), 'cursor'),
+        )
+        keys = (
+            [1], [], ['abc', 1], ['2020-13-45T00:00:00', 1], [None, None],
+            [{}, 1], [1, 1], ['2020-01-01T00:00:00+00:00', 'abc'],
+            ['2020-01-01T00:00:00+00:00', 1, 2],
+        )
+        for url, param in urls:
+            for key in keys:
+                cursor = encode_cursor(NEXT, key)
+                with self.subTest(url=url, key=key):
+                    response = self.authorized_client.get(
+                        url, {param: cursor, 'q': 'пост'})
+                    self.assertEqual(response.status_code, 200)
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': encode_cursor(NEXT, [1])})
+        self.assertEqual(len(response.context['page_obj']), POSTS_COUNT)
+
+    def test_page_count_cached(self):
+        """Число постов для ?page=N считается один раз на поколение."""
+        for reverse_name in self.templates_pages_names:
+            with self.subTest(reverse_name=reverse_name):
+                self.authorized_client.get(reverse_name, {'page': 2})
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        reverse_name, {'page': 2})
+                self.assertFalse(
+                    any('COUNT(' in query['sql'] for query in queries)
+                )
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count,
+                    self.TEST_POSTS_COUNT
+                )
+
+    def test_page_count_after_new_post(self):
+        url = reverse('posts:group_list', kwargs={'slug': 'testslug'})
+        self.authorized_client.get(url, {'page': 1})
+        Post.objects.create(author=self.user, group=self.group, text='Пост')
+        response = self.authorized_client.get(url, {'page': 1})
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            self.TEST_POSTS_COUNT + 1
+        )
+
+    def test_page_window(self):
+        """Ссылки только на соседние, первую и последнюю страницы."""
+        paginator = WindowPaginator(range(200), 10)
+        ellipsis = paginator.ELLIPSIS
+        cases = (
+            (1, [1, 2, 3, ellipsis, 20]),
+            (4, [1, 2, 3, 4, 5, 6, ellipsis, 20]),
+            (10, [1, ellipsis, 8, 9, 10, 11, 12, ellipsis, 20]),
+            (20, [1, ellipsis, 18, 19, 20]),
+        )
+        for number, window in cases:
+            with self.subTest(number=number):
+                self.assertEqual(paginator.page(number).window, window)
+        self.assertEqual(WindowPaginator(range(5), 10).get_window(1), [1])
+
 
 class CacheTests(TestCase):
 
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание группы',
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='Тестовый пост для проверки',
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'testslug'}),
+            reverse('posts:profile', kwargs={'username': 'user'}),
+        )
+
     def test_cache_index_page(self):
         """Проверка кэширования главной страницы"""
+        response = self.client.get(reverse('posts:index'))
+        # Запись в обход сигналов не сбрасывает кэш.
+        Post.objects.filter(pk=self.post.pk).update(text='Другой текст')
+        response_after_update = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_after_update.content)
+
+    def test_cache_invalidated_on_delete(self):
+        """Удаление поста сразу сбрасывает кэш страниц."""
+        for url in self.urls:
+            self.client.get(url)
+        self.post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotContains(response, 'Тестовый пост')
+
+    def test_cache_invalidated_on_group_rename(self):
+        """Переименование группы сбрасывает кэш ленты и профиля."""
+        for url in self.urls:
+            self.client.get(url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url in (self.urls[0], self.urls[2]):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Новое название')
+
+    def test_cache_invalidated_on_author_rename(self):
+        """Смена имени автора сбрасывает кэш всех лент с его постами."""
+        for url in self.urls:
+            self.client.get(url)
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Новое Имя')
+
+    def test_other_group_cache_kept(self):
+        """Новый пост не сбрасывает кэш чужой группы."""
+        other = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        scope = cache_scopes.group_scope(other.pk)
+        generation = cache_scopes.get_generation(scope)
+        Post.objects.create(author=self.user, group=self.group, text='Пост')
+        self.assertEqual(cache_scopes.get_generation(scope), generation)
+
+
+class ConditionalGetTests(TestCase):
+    """Неизменившиеся страницы отдаются как 304 Not Modified."""
+
+    def setUp(self):
         cache.clear()
-        user = User.objects.create_user(username='user')
-        post = Post.objects.create(
-            author=user,
+        self.user = User.objects.create_user(username='user')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testslug',
+            description='Тестовое описание группы',
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            group=self.group,
             text='Тестовый пост для проверки',
         )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'testslug'}),
+            reverse('posts:profile', kwargs={'username': 'user'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('private', response['Cache-Control'])
+
+    def test_not_modified_without_queries(self):
+        """Главная страница отвечает 304 без запросов к базе."""
+        etag = self.client.get(reverse('posts:index'))['ETag']
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:index'), HTTP_IF_NONE_MATCH=etag)
+
+    def test_modified_after_new_post(self):
+        """Новый пост меняет ETag лент."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls[:3]]
+        Post.objects.create(author=self.user, group=self.group, text='Ещё')
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_modified(self):
+        """Правка поста и новый комментарий меняют ETag страницы поста."""
+        url = self.urls[3]
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, 'Новый текст')
+
+    def test_profile_modified_after_follow(self):
+        """Подписка меняет ETag профиля автора."""
+        url = self.urls[2]
+        etag = self.client.get(url)['ETag']
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """ETag анонима не подходит авторизованному пользователю."""
+        etag = self.client.get(self.urls[0])['ETag']
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class PostCardsCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth_user')
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cards_rendered_once(self):
+        """Повторный показ ленты берёт карточки из кэша."""
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/article.html')
+        response = self.authorized_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/includes/article.html')
+        self.assertContains(response, 'Пост')
+
+    def test_card_refreshed_on_change(self):
+        """Карточка перерисовывается после правки поста и автора."""
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(
+            self.authorized_client.get(url), 'Исправленный пост'
+        )
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertContains(self.authorized_client.get(url), 'Лев')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth_user')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            )
+        )
+
+    def test_pending_thumbnail_not_generated_in_request(self):
+        """Пока миниатюры нет, страница отдаёт исходную картинку."""
         response = self.client.get(reverse('posts:index'))
-        post.delete()
-        response_after_del = self.client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_after_del.content)
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(
+            cache.get(thumbnails.cache_key(self.post.image.name))
+        )
+
+    def test_pregenerate_thumbnails(self):
+        """Команда pregenerate_thumbnails создаёт миниатюры заранее."""
+        call_command('pregenerate_thumbnails', workers=1, stdout=StringIO())
+        url = cache.get(thumbnails.cache_key(self.post.image.name))
+        self.assertIsNotNone(url)
+        self.assertEqual(thumbnails.get_url(self.post), url)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, url)
+
+    def test_page_thumbnails_fetched_in_one_call(self):
+        """Адреса миниатюр страницы читаются одним get_many."""
+        for num in range(3):
+            Post.objects.create(
+                author=self.user,
+                text='Ещё пост %s' % num,
+                image=SimpleUploadedFile(
+                    name='thumb%s.gif' % num,
+                    content=SMALL_GIF,
+                    content_type='image/gif'
+                )
+            )
+        call_command('pregenerate_thumbnails', workers=1, stdout=StringIO())
+        with mock.patch('posts.thumbnails.cache', wraps=cache) as spy:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(spy.get_many.call_count, 1)
+        spy.get.assert_not_called()
+        for post in Post.objects.all():
+            self.assertContains(
+                response, cache.get(thumbnails.cache_key(post.image.name))
+            )
 
 
 class CommentsAddTests(TestCase):
@@ -313,6 +666,51 @@ class CommentsAddTests(TestCase):
             ).exists()
         )
 
+    def test_add_comment_ajax(self):
+        """AJAX-запрос получает только фрагмент нового комментария."""
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'новый комментарий'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTemplateUsed(response, 'posts/includes/comment_item.html')
+        self.assertContains(response, 'новый комментарий', status_code=201)
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': ''},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_comments_pages(self):
+        """Комментарии выводятся страницами, остальные — фрагментом."""
+        total = COMMENTS_COUNT + 5
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Комментарий {n}')
+            for n in range(total)
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_COUNT)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.id}),
+            {'cursor': comments.next_cursor},
+        )
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in rest],
+            [f'Комментарий {n}' for n in range(COMMENTS_COUNT, total)]
+        )
+        self.assertFalse(rest.has_next())
+
 
 class FollowTests(TestCase):
 
@@ -391,3 +789,75 @@ class FollowTests(TestCase):
         response = self.unfollow_client.get(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']), 0)
         self.assertNotIn(post, response.context['page_obj'])
+
+    def test_new_post_fanned_out_to_follower(self):
+        """Новый пост раскладывается в ленту подписчика."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='тестовый текст')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки посты автора пропадают из ленты."""
+        Post.objects.create(author=self.author, text='тестовый текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_demoted_author_fanned_out(self):
+        """Автор перестал быть «звездой»: посты разложены одним запросом."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.unfollow, author=self.author)
+        post = Post.objects.create(author=self.author, text='звезда')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=self.unfollow).delete()
+        with self.assertNumQueries(1):
+            timeline.demote(self.author.pk)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            [(self.user.pk, post.pk)],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_merged_on_read(self):
+        """Посты «звёзд» не раскладываются, а подмешиваются при чтении."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1000):
+            Follow.objects.create(user=self.user, author=other)
+            own = Post.objects.create(author=other, text='обычный автор')
+        star = Post.objects.create(author=self.author, text='звезда')
+        self.assertFalse(TimelineEntry.objects.filter(post=star).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [star, own])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    @mock.patch('posts.utils.PARTS_PER_QUERY', 2)
+    def test_celebrity_pages(self):
+        """Посты нескольких «звёзд» идут по страницам без пропусков."""
+        expected = []
+        for num in range(3):
+            star = User.objects.create_user(username=f'star{num}')
+            Follow.objects.create(user=self.user, author=star)
+            expected += [
+                Post.objects.create(author=star, text=f'пост {num} {i}')
+                for i in range(5)
+            ]
+        expected.sort(key=lambda post: (post.pub_date, post.pk), reverse=True)
+        url = reverse('posts:follow_index')
+        posts, cursor = [], ''
+        while True:
+            page_obj = self.authorized_client.get(
+                url, {'cursor': cursor}
+            ).context['page_obj']
+            posts += list(page_obj)
+            if not page_obj.has_next():
+                break
+            cursor = page_obj.next_cursor
+        self.assertEqual(posts, expected)
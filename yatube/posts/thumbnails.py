@@ -0,0 +1,129 @@
+"""Генерация миниатюр sorl-thumbnail вне обработки запроса.
+
+После сохранения поста с картинкой миниатюра ставится в очередь
+локального пула потоков. Шаблонный тег post_thumbnail никогда не
+генерирует миниатюру сам: он берёт готовый адрес из кэша, а пока
+миниатюры нет — ставит её в очередь и отдаёт адрес исходной картинки.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+from core import metrics
+
+from . import cache as posts_cache
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+PREFIX = 'posts:thumbnail:'
+
+GENERATE_SECONDS = metrics.histogram(
+    'posts_thumbnail_seconds', 'Время генерации миниатюры.'
+)
+FAILURES = metrics.counter(
+    'posts_thumbnail_failures_total', 'Неудачные генерации миниатюр.'
+)
+PENDING = metrics.gauge(
+    'posts_thumbnails_pending', 'Миниатюры в очереди на генерацию.'
+)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def cache_key(name):
+    return PREFIX + name
+
+
+def generate(name):
+    """Создаёт миниатюру и запоминает её адрес. Возвращает адрес."""
+    start = time.monotonic()
+    thumbnail = get_thumbnail(name, GEOMETRY, **OPTIONS)
+    cache.set(cache_key(name), thumbnail.url, timeout=None)
+    duration = time.monotonic() - start
+    GENERATE_SECONDS.observe(duration)
+    logger.debug('Thumbnail for %s generated in %.3fs', name, duration)
+    return thumbnail.url
+
+
+def _run(name, scopes):
+    try:
+        generate(name)
+        # Страницы, закэшированные с исходной картинкой, перестраиваются.
+        posts_cache.bump(*scopes)
+    except Exception:
+        FAILURES.inc()
+        logger.exception('Thumbnail generation failed for %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+            PENDING.set(len(_pending))
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _submit(name, scopes):
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        PENDING.set(len(_pending))
+    _get_executor().submit(_run, name, scopes)
+
+
+def schedule(post):
+    """Ставит миниатюру поста в очередь после фиксации транзакции."""
+    name = post.image.name
+    scopes = posts_cache.post_scopes(post)
+    transaction.on_commit(lambda: _submit(name, scopes))
+
+
+def prefetch(posts):
+    """Находит адреса миниатюр целой страницы одним get_many.
+
+    Результат запоминается в post.thumbnail_url, и get_url больше
+    не обращается к кэшу для этих постов.
+    """
+    posts = [post for post in posts if post.image]
+    keys = {cache_key(post.image.name) for post in posts}
+    found = cache.get_many(keys) if keys else {}
+    for post in posts:
+        post.thumbnail_url = found.get(cache_key(post.image.name))
+
+
+def get_url(post):
+    """Адрес миниатюры без генерации; None, если картинки нет.
+
+    Если миниатюра ещё не готова, возвращается адрес исходной картинки,
+    а пост помечается как post.thumbnail_pending.
+    """
+    if not post.image:
+        return None
+    if 'thumbnail_url' in post.__dict__:
+        url = post.thumbnail_url
+    else:
+        url = cache.get(cache_key(post.image.name))
+    if url is None:
+        post.thumbnail_pending = True
+        schedule(post)
+        return post.image.url
+    return url
@@ -0,0 +1,158 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается в ленты подписчиков автора, а follow_index
+читает свою ленту одним диапазонным запросом по индексу. Посты авторов,
+у которых подписчиков больше TIMELINE_FANOUT_LIMIT, не раскладываются:
+они подмешиваются в ленту при чтении.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from . import follow_graph
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 1000
+FEED_ORDERING = ('-feed_date', '-feed_id')
+
+
+def get_fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+
+
+def get_celebrity_ids(author_ids):
+    """Авторы, чьи посты подмешиваются в ленту при чтении."""
+    return set(
+        UserStats.objects.filter(
+            user_id__in=author_ids,
+            followers_count__gt=get_fanout_limit(),
+        ).values_list('user_id', flat=True)
+    )
+
+
+def is_celebrity(author_id):
+    return bool(get_celebrity_ids([author_id]))
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in follower_ids
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя все посты нового автора."""
+    if is_celebrity(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .values_list('id', 'pub_date')
+        .iterator()
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _insert_from_follows(where='', params=()):
+    """INSERT ... SELECT постов авторов в ленты их подписчиков.
+
+    Записи, которые уже есть в ленте, пропускаются.
+    """
+    entry_table = TimelineEntry._meta.db_table
+    follow_table = Follow._meta.db_table
+    post_table = Post._meta.db_table
+    sql = (
+        f'INSERT INTO {entry_table} (user_id, post_id, author_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        f'FROM {follow_table} f '
+        f'INNER JOIN {post_table} p ON p.author_id = f.author_id '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {entry_table} e '
+        f'WHERE e.user_id = f.user_id AND e.post_id = p.id)'
+    )
+    if where:
+        sql += f' AND {where}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(params))
+
+
+def demote(author_id):
+    """Автор перестал быть «звездой»: раскладываем его посты подписчикам.
+
+    Одним запросом на всех подписчиков: demote вызывается из запроса
+    отписки, внутри пишущей транзакции.
+    """
+    _insert_from_follows('f.author_id = %s', [author_id])
+
+
+def rebuild():
+    """Перестраивает все ленты одним INSERT ... SELECT."""
+    celebrity_ids = list(get_celebrity_ids(
+        Follow.objects.values('author_id')
+    ))
+    TimelineEntry.objects.all().delete()
+    where = ''
+    if celebrity_ids:
+        placeholders = ', '.join(['%s'] * len(celebrity_ids))
+        where = f'f.author_id NOT IN ({placeholders})'
+    _insert_from_follows(where, celebrity_ids)
+
+
+def get_sources(user):
+    """Источники ленты для CursorPaginator: лента и посты «звёзд»."""
+    feed = (
+        Post.objects.select_related('author', 'group')
+        .filter(timeline_entries__user=user)
+        .annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_id=F('timeline_entries__post_id'),
+        )
+    )
+    sources = [(feed, FEED_ORDERING)]
+    following_ids = follow_graph.get_following_ids(user.pk)
+    celebrity_ids = get_celebrity_ids(following_ids) if following_ids else ()
+    if celebrity_ids:
+        # У каждой «звезды» своя часть с LIMIT по индексу (автор, дата);
+        # пагинатор читает все части одним запросом и сливает их.
+        sources.append((
+            Post.objects.select_related('author', 'group'),
+            ('-pub_date', '-id'),
+            ('author_id', sorted(celebrity_ids)),
+        ))
+    return sources
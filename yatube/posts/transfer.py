@@ -0,0 +1,274 @@
+"""Потоковые выгрузка и загрузка данных posts в NDJSON.
+
+Файл — по одной JSON-записи на строку: заголовок, затем пользователи,
+группы, посты, комментарии и подписки. Выгрузка читает таблицы
+итераторами по первичному ключу, загрузка пишет пачками bulk_create,
+поэтому память не растёт с размером данных.
+
+Пользователи и группы сопоставляются с существующими по username и
+slug (словарь старый id -> новый id). Посты получают id со сдвигом на
+максимальный id в базе, поэтому ссылки комментариев пересчитываются
+без словаря. Файлы картинок не переносятся — только их имена.
+"""
+import datetime
+import gzip
+import io
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, timeline
+from .models import Comment, Follow, Group, Post, User
+
+FORMAT = 'yatube'
+VERSION = 1
+BATCH_SIZE = 5000
+
+# Порядок важен: записи ссылаются только на модели выше по списку.
+MODELS = (
+    ('user', User, (
+        'id', 'username', 'first_name', 'last_name', 'email', 'password',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+    )),
+    ('group', Group, ('id', 'title', 'slug', 'description')),
+    ('post', Post, (
+        'id', 'text', 'pub_date', 'updated', 'author_id', 'group_id', 'image',
+    )),
+    ('comment', Comment, ('id', 'text', 'created', 'post_id', 'author_id')),
+    ('follow', Follow, ('user_id', 'author_id')),
+)
+NAMES = tuple(name for name, _, _ in MODELS)
+DATE_FIELDS = ('date_joined', 'last_login', 'pub_date', 'updated', 'created')
+
+
+class Encoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд; здесь — полностью."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class TransferError(ValueError):
+    """Файл не похож на выгрузку yatube."""
+
+
+class Progress:
+    """Считает записи и печатает скорость не чаще раза в interval секунд."""
+
+    def __init__(self, write, interval=1.0):
+        self.write = write
+        self.interval = interval
+        self.counts = Counter()
+        self.start = self.last = time.monotonic()
+
+    def __call__(self, name, count=1):
+        self.counts[name] += count
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        total = sum(self.counts.values())
+        parts = ', '.join(
+            f'{name}: {self.counts[name]}'
+            for name in NAMES if self.counts[name]
+        )
+        self.write(
+            f'{parts or "нет записей"} — {total} за {elapsed:.1f} с '
+            f'({total / elapsed:.0f} записей/с)'
+        )
+
+
+def open_output(path, compress=False):
+    if compress or path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def open_input(path):
+    """Открывает файл на чтение; gzip определяется по сигнатуре."""
+    raw = open(path, 'rb')
+    if raw.peek(2)[:2] == b'\x1f\x8b':
+        raw = gzip.GzipFile(fileobj=raw)
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def export(stream, chunk_size=BATCH_SIZE, progress=None):
+    """Пишет все модели в stream построчно."""
+    encoder = Encoder(ensure_ascii=False, separators=(',', ':'))
+    stream.write(encoder.encode({'format': FORMAT, 'version': VERSION}))
+    stream.write('\n')
+    for name, model, fields in MODELS:
+        rows = model.objects.order_by('pk').values(*fields)
+        for row in rows.iterator(chunk_size=chunk_size):
+            stream.write(encoder.encode({'model': name, 'fields': row}))
+            stream.write('\n')
+            if progress:
+                progress(name)
+
+
+@contextmanager
+def keep_dates():
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field for model in (Post, Comment) for field in model._meta.fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """Загружает записи пачками, пересчитывая внешние ключи."""
+
+    def __init__(self, batch_size=BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.user_ids = {}
+        self.group_ids = {}
+        self.post_offset = Post.objects.aggregate(top=Max('pk'))['top'] or 0
+        self.buffers = {name: [] for name in NAMES}
+        self.report = Counter()
+
+    def add(self, name, fields):
+        if name not in self.buffers:
+            raise TransferError(f'Неизвестная модель: {name}')
+        for field in DATE_FIELDS:
+            if fields.get(field):
+                fields[field] = parse_datetime(fields[field])
+        self.buffers[name].append(fields)
+        if len(self.buffers[name]) >= self.batch_size:
+            self.flush(name)
+
+    def flush(self, name=NAMES[-1]):
+        """Записывает пачку name и все пачки, на которые она ссылается."""
+        for current in NAMES[:NAMES.index(name) + 1]:
+            rows = self.buffers[current]
+            if rows:
+                loaded = getattr(self, f'_load_{current}')(rows)
+                self.report[current] += loaded
+                self.report['skipped'] += len(rows) - loaded
+                if self.progress:
+                    self.progress(current, len(rows))
+                self.buffers[current] = []
+
+    def _load_by_key(self, model, key, rows, ids):
+        model.objects.bulk_create(
+            [
+                model(**{k: v for k, v in row.items() if k != 'id'})
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+        found = dict(
+            model.objects.filter(
+                **{f'{key}__in': [row[key] for row in rows]}
+            ).values_list(key, 'pk')
+        )
+        for row in rows:
+            ids[row['id']] = found[row[key]]
+        return len(rows)
+
+    def _load_user(self, rows):
+        return self._load_by_key(User, 'username', rows, self.user_ids)
+
+    def _load_group(self, rows):
+        return self._load_by_key(Group, 'slug', rows, self.group_ids)
+
+    def _load_post(self, rows):
+        posts = [
+            Post(
+                pk=row['id'] + self.post_offset,
+                text=row['text'],
+                pub_date=row['pub_date'],
+                updated=row['updated'],
+                author_id=self.user_ids[row['author_id']],
+                group_id=self.group_ids.get(row['group_id']),
+                image=row['image'],
+            )
+            for row in rows if row['author_id'] in self.user_ids
+        ]
+        with keep_dates():
+            Post.objects.bulk_create(posts)
+        return len(posts)
+
+    def _load_comment(self, rows):
+        comments = [
+            Comment(
+                text=row['text'],
+                created=row['created'],
+                post_id=row['post_id'] + self.post_offset,
+                author_id=self.user_ids[row['author_id']],
+            )
+            for row in rows if row['author_id'] in self.user_ids
+        ]
+        with keep_dates():
+            Comment.objects.bulk_create(comments)
+        return len(comments)
+
+    def _load_follow(self, rows):
+        follows = [
+            Follow(
+                user_id=self.user_ids[row['user_id']],
+                author_id=self.user_ids[row['author_id']],
+            )
+            for row in rows
+            if row['user_id'] in self.user_ids
+            and row['author_id'] in self.user_ids
+        ]
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return len(follows)
+
+    def finish(self):
+        """Дописывает хвосты и восстанавливает производные данные.
+
+        bulk_create не отправляет сигналы, поэтому счётчики и ленты
+        подписок пересчитываются целиком, а поколения кэша страниц
+        затронутых групп и авторов сдвигаются.
+        """
+        self.flush()
+        sql_list = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post, Comment, Follow]
+        )
+        with connection.cursor() as cursor:
+            for sql in sql_list:
+                cursor.execute(sql)
+        counters.rebuild()
+        timeline.rebuild()
+        cache.bump_on_commit(
+            cache.index_scope(),
+            *(cache.group_scope(pk) for pk in self.group_ids.values()),
+            *(cache.author_scope(pk) for pk in self.user_ids.values()),
+        )
+        return self.report
+
+
+def load(stream, batch_size=BATCH_SIZE, progress=None):
+    """Читает выгрузку из stream; возвращает число записей по моделям."""
+    header = json.loads(stream.readline() or '{}')
+    if header.get('format') != FORMAT or header.get('version') != VERSION:
+        raise TransferError('Файл не является выгрузкой yatube.')
+    importer = Importer(batch_size, progress)
+    for line in stream:
+        if line.strip():
+            record = json.loads(line)
+            importer.add(record['model'], record['fields'])
+    return importer.finish()
@@ -15,7 +15,13 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments_fragment,
+        name='comments'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search_posts, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,8 +1,340 @@
-# posts/utils.py
-from django.core.paginator import Paginator
+import json
 
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_text
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
-def get_page_obj(request, posts_list, posts_count):
+NEXT = 'n'
+PREVIOUS = 'p'
+POSTS_ORDERING = ('-pub_date', '-id')
+COMMENTS_ORDERING = ('created', 'id')
+# Частей источника в одном запросе: у каждой по несколько параметров,
+# а у SQLite ограничены и их число, и глубина выражения OR.
+PARTS_PER_QUERY = 200
+
+
+def encode_cursor(direction, key):
+    """Непрозрачный курсор: направление и ключ граничного объекта."""
+    values = [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in key
+    ]
+    payload = json.dumps([direction, values], separators=(',', ':'))
+    return urlsafe_base64_encode(payload.encode())
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для битого курсора возвращает None.
+
+    Ключ — ровно два скалярных значения (строки с датой превращаются
+    в datetime). Соответствие типов полям сортировки проверяет
+    CursorPaginator.
+    """
+    try:
+        direction, values = json.loads(
+            force_text(urlsafe_base64_decode(cursor))
+        )
+    except (TypeError, ValueError):
+        return None
+    if (
+        direction not in (NEXT, PREVIOUS)
+        or not isinstance(values, list)
+        or len(values) != 2
+    ):
+        return None
+    key = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(
+            value, (str, int, float)
+        ):
+            return None
+        if isinstance(value, str):
+            try:
+                value = parse_datetime(value) or value
+            except ValueError:
+                return None
+        key.append(value)
+    return direction, tuple(key)
+
+
+class CursorPage:
+    """Страница keyset-пагинации, совместимая с шаблонами Page.
+
+    Запрос выполняется при первом обращении к содержимому страницы,
+    поэтому попадание в кэш фрагмента шаблона обходится без него.
+    """
+
+    number = None
+
+    def __init__(self, paginator, cursor='', direction=NEXT, key=None):
+        self.paginator = paginator
+        self.cursor = cursor
+        self.direction = direction
+        self.key = key
+
+    def __repr__(self):
+        return '<CursorPage %r>' % (self.cursor or 'first')
+
+    @cached_property
+    def _page(self):
+        return self.paginator.fetch_page(self.direction, self.key)
+
+    @property
+    def object_list(self):
+        return self._page[0]
+
+    @property
+    def next_cursor(self):
+        return self._page[1]
+
+    @property
+    def previous_cursor(self):
+        return self._page[2]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    def has_previous(self):
+        return bool(self.previous_cursor)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре полей (ключ сортировки, уникальный id).
+
+    Не делает COUNT(*) и OFFSET: каждая страница — это диапазонный
+    запрос по индексу от граничного ключа, поэтому тысячная страница
+    стоит столько же, сколько первая.
+
+    sources — пары (queryset, ordering), которые сливаются в одну ленту.
+    Третий элемент (поле, значения) делит источник на части по значениям
+    поля: у каждой части свой LIMIT и свой индекс, а читаются они одним
+    запросом.
+    """
+
+    def __init__(self, object_list, per_page, ordering=POSTS_ORDERING,
+                 sources=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.descending = ordering[0].startswith('-')
+        self.sources = sources or [(object_list, ordering)]
+        self.merged = len(self.sources) > 1 or len(self.sources[0]) > 2
+
+    @cached_property
+    def count(self):
+        """Полное число объектов считается только по требованию."""
+        return self.object_list.count()
+
+    @staticmethod
+    def _fields(ordering):
+        return tuple(field.lstrip('-') for field in ordering)
+
+    def _seek(self, queryset, ordering, key, forward):
+        first, second = self._fields(ordering)
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return queryset.filter(
+            Q(**{f'{first}__{lookup}': key[0]})
+            | Q(**{first: key[0], f'{second}__{lookup}': key[1]})
+        )
+
+    @staticmethod
+    def _order(ordering, forward):
+        if forward:
+            return ordering
+        return tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in ordering
+        )
+
+    def _limited(self, queryset, ordering, key, forward, limit):
+        if key is not None:
+            queryset = self._seek(queryset, ordering, key, forward)
+        return queryset.order_by(*self._order(ordering, forward))[:limit]
+
+    def _read(self, source, key, forward, limit):
+        """Запросы источника: один, а для частей — по PARTS_PER_QUERY."""
+        queryset, ordering, *partition = source
+        if not partition:
+            return [self._limited(queryset, ordering, key, forward, limit)]
+        field, values = partition[0]
+        querysets = []
+        for start in range(0, len(values), PARTS_PER_QUERY):
+            parts = Q()
+            for value in values[start:start + PARTS_PER_QUERY]:
+                parts |= Q(pk__in=self._limited(
+                    queryset.filter(**{field: value}), ordering, key,
+                    forward, limit,
+                ).values('pk'))
+            # Без ORDER BY: строки частей сортирует _fetch.
+            querysets.append(queryset.filter(parts).order_by())
+        return querysets
+
+    def _fetch(self, key, forward, limit=None):
+        """Сливает по limit (per_page + 1) объектов из каждого источника."""
+        limit = limit or self.per_page + 1
+        rows = []
+        for source in self.sources:
+            fields = self._fields(source[1])
+            for queryset in self._read(source, key, forward, limit):
+                rows.extend(
+                    (tuple(getattr(obj, field) for field in fields), obj)
+                    for obj in queryset
+                )
+        if self.merged:
+            rows.sort(
+                key=lambda row: row[0],
+                reverse=forward == self.descending
+            )
+            unique = {}
+            for row in rows:
+                unique.setdefault(row[1].pk, row)
+            rows = list(unique.values())
+        return rows[:limit]
+
+    def _clean_key(self, key):
+        """Ключ курсора в типах полей сортировки или None."""
+        queryset, ordering = self.sources[0][:2]
+        annotations = queryset.query.annotations
+        try:
+            return tuple(
+                (
+                    annotations[name].output_field if name in annotations
+                    else queryset.model._meta.get_field(name)
+                ).to_python(value)
+                for name, value in zip(self._fields(ordering), key)
+            )
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def get_page(self, cursor=None):
+        decoded = decode_cursor(cursor) if cursor else None
+        key = self._clean_key(decoded[1]) if decoded else None
+        if key is None:
+            return CursorPage(self)
+        return CursorPage(self, cursor, decoded[0], key)
+
+    def fetch_page(self, direction, key):
+        """Объекты страницы и курсоры на соседние страницы."""
+        forward = direction == NEXT
+        rows = self._fetch(key, forward)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        has_next = has_more if forward else True
+        has_previous = key is not None if forward else has_more
+        next_cursor = previous_cursor = ''
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, rows[-1][0])
+        if rows and has_previous:
+            previous_cursor = encode_cursor(PREVIOUS, rows[0][0])
+        return [obj for _, obj in rows], next_cursor, previous_cursor
+
+
+class MergedSequence:
+    """Слитые источники CursorPaginator для старых ссылок ?page=N.
+
+    Каждый источник читается по своему индексу с LIMIT, поэтому
+    неглубокие страницы не требуют общей сортировки во временном B-дереве.
+    """
+
+    def __init__(self, paginator):
+        self.paginator = paginator
+
+    def count(self):
+        return self.paginator.count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        rows = self.paginator._fetch(None, True, limit=stop)
+        return [obj for _, obj in rows[start:stop]]
+
+
+class WindowPage(Page):
+    @property
+    def window(self):
+        return self.paginator.get_window(self.number)
+
+
+class WindowPaginator(Paginator):
+    """Paginator для ссылок ?page=N с окном номеров вокруг текущей.
+
+    Вместо всех страниц шаблон выводит первую, последнюю и несколько
+    соседних с текущей, пропуски обозначаются ELLIPSIS. count можно
+    передать числом или функцией без аргументов (например, счётчиком
+    из кэша) — тогда COUNT(*) по object_list не выполняется.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count=None, on_each_side=2,
+                 on_ends=1, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+        self.on_each_side = on_each_side
+        self.on_ends = on_ends
+
+    @cached_property
+    def count(self):
+        if self._count is None:
+            return super().count
+        return self._count() if callable(self._count) else self._count
+
+    def _get_page(self, *args, **kwargs):
+        return WindowPage(*args, **kwargs)
+
+    def get_window(self, number):
+        """Номера страниц вокруг number, пропуски — ELLIPSIS."""
+        last = self.num_pages
+        around = range(
+            max(1, number - self.on_each_side),
+            min(last, number + self.on_each_side) + 1,
+        )
+        head = range(1, min(self.on_ends, last) + 1)
+        tail = range(max(last - self.on_ends + 1, 1), last + 1)
+        window = []
+        for page in sorted({*head, *around, *tail}):
+            if window and page - window[-1] == 2:
+                window.append(page - 1)
+            elif window and page - window[-1] > 2:
+                window.append(self.ELLIPSIS)
+            window.append(page)
+        return window
+
+
+def get_page_obj(request, posts_list, posts_count, sources=None, count=None):
+    """Страница постов.
+
+    По умолчанию используется keyset-пагинация по курсору (?cursor=...).
+    Старые ссылки вида ?page=N продолжают работать через WindowPaginator.
+    sources — необязательные быстрые пути чтения того же набора постов
+    в виде пар (queryset, ordering), которые сливаются по ключу.
+    count — число постов или функция, которая его вернёт (см.
+    WindowPaginator); нужно только для ?page=N.
+    """
+    paginator = CursorPaginator(posts_list, posts_count, sources=sources)
     page_number = request.GET.get('page')
-    paginator = Paginator(posts_list, posts_count)
-    return paginator.get_page(page_number)
+    if page_number is not None and 'cursor' not in request.GET:
+        if sources:
+            posts_list = MergedSequence(paginator)
+        return WindowPaginator(
+            posts_list, posts_count, count=count
+        ).get_page(page_number)
+    return paginator.get_page(request.GET.get('cursor'))
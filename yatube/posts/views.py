@@ -1,74 +1,148 @@
 # posts/views.py
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.db import retry_on_locked
+from core.query_budget import query_budget
+
+from . import cache, counters, follow_graph, search, timeline
+from .conditional import (
+    conditional_page, group_etag, index_etag, post_etag, post_last_modified,
+    profile_etag,
+)
 from .forms import PostForm, CommentForm
 from .models import Follow, Group, Post
-from .utils import get_page_obj
+from .utils import COMMENTS_ORDERING, CursorPaginator, get_page_obj
 
 POSTS_COUNT: int = 10
+COMMENTS_COUNT: int = 20
 
 User = get_user_model()
 
 
+@query_budget(5)
+@conditional_page(index_etag)
 def index(request):
     """"Главная страница."""
     template = 'posts/index.html'
     posts = Post.objects.select_related('author', 'group')
-    page_obj = get_page_obj(request, posts, POSTS_COUNT)
+    scope = cache.index_scope()
+    generation = cache.get_generation(scope)
+    page_obj = get_page_obj(
+        request, posts, POSTS_COUNT,
+        count=lambda: cache.get_count(scope, posts, generation),
+    )
     context = {
         'page_obj': page_obj,
+        'cache_generation': generation,
     }
     return render(request, template, context)
 
 
+@query_budget(6)
+@conditional_page(group_etag)
 def group_posts(request, slug):
     """Группы."""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = get_page_obj(request, posts, POSTS_COUNT)
+    posts = group.posts.select_related('author', 'group')
+    scope = cache.group_scope(group.pk)
+    generation = cache.get_generation(scope)
+    page_obj = get_page_obj(
+        request, posts, POSTS_COUNT,
+        count=lambda: cache.get_count(scope, posts, generation),
+    )
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'page_obj': page_obj,
+        'cache_generation': generation,
     }
     return render(request, template, context)
 
 
+@query_budget(7)
+@conditional_page(profile_etag)
 def profile(request, username):
     """Страница пользователя."""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
     following = (request.user.is_authenticated
-                 and author.following.filter(user=request.user).exists())
-    posts = author.posts.all()
-    page_obj = get_page_obj(request, posts, POSTS_COUNT)
+                 and follow_graph.is_following(request.user.pk, author.pk))
+    posts = author.posts.select_related('group')
+    stats = counters.get_stats(author)
+    page_obj = get_page_obj(
+        request, posts, POSTS_COUNT, count=stats.posts_count
+    )
     template = 'posts/profile.html'
     context = {
         'author': author,
+        'stats': stats,
         'page_obj': page_obj,
         'following': following,
+        'cache_generation': cache.get_generation(
+            cache.author_scope(author.pk)
+        ),
+    }
+    return render(request, template, context)
+
+
+@query_budget(5)
+def search_posts(request):
+    """Поиск по постам и комментариям."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search.get_page_obj(request, POSTS_COUNT),
     }
     return render(request, template, context)
 
 
+@query_budget(6)
+@conditional_page(post_etag, post_last_modified)
 def post_detail(request, post_id):
     """Страница поста."""
-    post = get_object_or_404(Post, id=post_id)
-    count = Post.objects.filter(author_id=post.author_id).count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
+    count = counters.get_stats(post.author).posts_count
     template = 'posts/post_detail.html'
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
         'count': count,
         'form': form,
-        'comments': comments,
+        'comments': get_comments_page(post, request.GET.get('comments')),
     }
     return render(request, template, context)
 
 
+def get_comments_page(post, cursor=None):
+    """Страница комментариев поста по курсору, старые сначала."""
+    comments = post.comments.select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_COUNT, COMMENTS_ORDERING)
+    return paginator.get_page(cursor)
+
+
+@query_budget(3)
+def comments_fragment(request, post_id):
+    """Следующая пачка комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post, id=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments_page.html', context)
+
+
+@query_budget(8)
 @login_required
+@retry_on_locked()
 def post_create(request):
     """Новый пост."""
     template = 'posts/create_post.html'
@@ -84,7 +158,9 @@ def post_create(request):
     return render(request, template, {'form': form})
 
 
+@query_budget(6)
 @login_required
+@retry_on_locked()
 def post_edit(request, post_id):
     """Редактировать пост."""
     post = get_object_or_404(Post, id=post_id)
@@ -106,7 +182,9 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(6)
 @login_required
+@retry_on_locked()
 def add_comment(request, post_id):
     """Новый комментарий."""
     post = get_object_or_404(Post, id=post_id)
@@ -116,18 +194,34 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        if request.is_ajax():
+            # Странице нужен только фрагмент нового комментария.
+            return render(
+                request, 'posts/includes/comment_item.html',
+                {'comment': comment}, status=201
+            )
+    elif request.is_ajax():
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
 def follow_index(request):
     """Подписки текущего пользователя."""
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_obj(request, posts, POSTS_COUNT)
+    author_ids = follow_graph.get_following_ids(request.user.pk)
+    posts = Post.objects.filter(author_id__in=author_ids)
+    page_obj = get_page_obj(
+        request, posts, POSTS_COUNT,
+        sources=timeline.get_sources(request.user),
+        count=lambda: counters.get_posts_count(author_ids),
+    )
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
+@query_budget(14)
 @login_required
+@retry_on_locked(methods=('GET', 'POST'))
 def profile_follow(request, username):
     """Подписаться на автора."""
     author = get_object_or_404(User, username=username)
@@ -136,7 +230,9 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(12)
 @login_required
+@retry_on_locked(methods=('GET', 'POST'))
 def profile_unfollow(request, username):
     """Дизлайк, отписка."""
     author = get_object_or_404(User, username=username)
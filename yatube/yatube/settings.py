@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',  # приложение users
     'core.apps.CoreConfig',  # приложение core
     'about.apps.AboutConfig',  # приложение about
+    'api.apps.ApiConfig',  # приложение api
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -29,6 +31,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.MetricsMiddleware',
+    'core.middleware.slow_queries.SlowQueryMiddleware',
+    'core.middleware.page_cache.AnonymousPageCacheMiddleware',
+    'core.middleware.profiler.ProfilerMiddleware',
+    'core.middleware.query_budget.QueryBudgetMiddleware',
+    'core.middleware.replica.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,11 +70,31 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 с SQLITE_TRANSACTION_MODE.
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Реплики для чтения (core.db_router). Локально YATUBE_REPLICAS=N
+# добавляет N копий основной базы в отдельных файлах SQLite; копии
+# обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+for num in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{num}'] = {
+        'ENGINE': 'core.db_backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.replica{num}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{num}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Представления, которые читают с реплик, и сколько секунд после записи
+# пользователь читает основную базу, чтобы видеть свои изменения.
+REPLICA_READ_VIEWS = ('posts.', 'api.')
+REPLICA_PIN_SECONDS = 15
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -105,15 +133,117 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
+# Один файл на хост: кэш и поколения фрагментов общие для всех
+# воркеров (LocMemCache у каждого процесса свой).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yatube_cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
 
+# Тесты получают свои кэш и каталог метрик во временном каталоге
+# (core.test_runner).
+TEST_RUNNER = 'core.test_runner.TestRunner'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Авторы с большим числом подписчиков не раскладываются в ленты
+# при публикации, а подмешиваются в follow_index при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Потоки, создающие миниатюры картинок вне обработки запросов.
+THUMBNAIL_WORKERS = 2
+
+# Бюджеты SQL-запросов представлений (core.query_budget).
+# В RAISE-режиме превышение бюджета — исключение, иначе предупреждение в лог.
+QUERY_BUDGET_ENABLED = True
+QUERY_BUDGET_RAISE = False
+# Сколько повторов одного запроса считать признаком N+1.
+QUERY_BUDGET_REPEATS = 3
+
+# PRAGMA для каждого нового соединения с SQLite (core.db): WAL не
+# блокирует читателей на время записи, busy_timeout — ожидание
+# блокировки в миллисекундах вместо немедленной ошибки.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+}
+# BEGIN IMMEDIATE в transaction.atomic(): писатели ждут блокировку в
+# начале транзакции, а не получают «database is locked» посреди неё.
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+# Сколько раз выполнять пишущее представление при «database is locked».
+WRITE_RETRY_ATTEMPTS = 3
+
+# Кэш целых страниц для анонимных посетителей
+# (core.middleware.page_cache).
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'about:author',
+    'about:tech',
+)
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Теги страницы по ResolverMatch и их текущие версии.
+PAGE_CACHE_TAGS = 'posts.cache.page_tags'
+PAGE_CACHE_VERSIONS = 'posts.cache.get_generations'
+
+# Выборочное профилирование запросов (core.profiling): доля запросов
+# или запросы с заголовком PROFILER_HEADER, подписанным make_token()
+# (manage.py profile_report --token).
+PROFILER_ENABLED = bool(os.environ.get('YATUBE_PROFILER'))
+PROFILER_SAMPLE_RATE = float(os.environ.get('YATUBE_PROFILER_RATE', 0.01))
+PROFILER_HEADER = 'X-Profile'
+PROFILER_TOKEN_MAX_AGE = 60 * 60 * 24
+PROFILER_DIR = os.path.join(tempfile.gettempdir(), 'yatube_profiles')
+PROFILER_MAX_FILES = 500
+
+# Метрики процессов (core.metrics): файлы <pid>.json в METRICS_DIR,
+# сводка — на /metrics для адресов из METRICS_ALLOWED_IPS (None — всем).
+# За обратным прокси задайте YATUBE_METRICS_TOKEN: тогда /metrics
+# требует заголовок Authorization: Bearer <токен> (core.views).
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube_metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN')
+
+# Журнал медленных SQL-запросов (core.slow_queries); None — выключен.
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_STACK_DEPTH = 5
+SLOW_QUERY_LOG = os.path.join(tempfile.gettempdir(), 'yatube_slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}